@@ -0,0 +1,198 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+POSTS = reverse('api:posts')
+GROUPS = reverse('api:groups')
+FOLLOWS = reverse('api:follows')
+
+
+@override_settings(CONSTANTS={**settings.CONSTANTS, 'POSTS_PER_PAGE': 2})
+class ApiTests(TestCase):
+    """Тестируем JSON API."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Котики', slug='cats')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def send(self, method, url, data, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        return getattr(self.client, method)(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_cursor_pages(self):
+        """Ссылки next/previous обходят все посты без повторов."""
+        response = self.client.get(POSTS)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b', ', response.content)
+        page = response.json()
+        ids = [post['id'] for post in page['results']]
+        self.assertIsNone(page['previous'])
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            ids += [post['id'] for post in page['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        previous = self.client.get(page['previous']).json()
+        self.assertEqual(
+            [post['id'] for post in previous['results']],
+            [self.posts[2].id, self.posts[1].id])
+        first = self.client.get(POSTS, {'limit': 100}).json()['results'][0]
+        self.assertEqual(first['author'], 'author')
+        self.assertEqual(first['group'], 'cats')
+
+    def test_broken_cursor(self):
+        """Битый курсор, в том числе не ASCII, — ошибка 400."""
+        for cursor in ('not-a-cursor', 'привет'):
+            for url in (POSTS, GROUPS):
+                with self.subTest(cursor=cursor, url=url):
+                    response = self.client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('cursor', response.json()['errors'])
+
+    def test_sparse_fields(self):
+        """?fields= выбирает из базы только запрошенные колонки."""
+        with self.assertNumQueries(1) as queries:
+            page = self.client.get(POSTS, {'fields': 'text'}).json()
+        self.assertEqual(page['results'][0], {'text': 'Пост 4'})
+        self.assertNotIn('author', queries.captured_queries[0]['sql'])
+        response = self.client.get(POSTS, {'fields': 'text,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json()['errors'])
+
+    def test_conditional_get(self):
+        """Пока данные не менялись, ответ — 304 без запросов к базе."""
+        url = reverse('api:post_detail', args=[self.posts[0].id])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Ура')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comment_count'], 1)
+
+    def test_rename_changes_etag(self):
+        """Смена имени автора и слага группы меняет ETag поста, его
+        комментариев и списков с этим постом."""
+        post = self.posts[0]
+        urls = (
+            reverse('api:post_detail', args=[post.id]),
+            reverse('api:comments', args=[post.id]),
+            f'{POSTS}?author=author',
+            f'{POSTS}?group=cats',
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.author.username = 'writer'
+        self.author.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'kittens'
+        group.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        detail = self.client.get(urls[0]).json()
+        self.assertEqual(
+            (detail['author'], detail['group']), ('writer', 'kittens'))
+
+    def test_filters_and_groups(self):
+        Post.objects.create(author=self.reader, text='Без группы')
+        page = self.client.get(POSTS, {'group': 'cats', 'limit': 10}).json()
+        self.assertEqual(len(page['results']), 5)
+        page = self.client.get(POSTS, {'author': 'reader'}).json()
+        self.assertEqual(page['results'][0]['group'], None)
+        page = self.client.get(GROUPS).json()
+        self.assertEqual(page['results'][0]['slug'], 'cats')
+        response = self.client.get(
+            reverse('api:group_detail', args=['cats']))
+        self.assertEqual(response.json()['title'], 'Котики')
+        response = self.client.get(reverse('api:group_detail', args=['no']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_and_edit_post(self):
+        response = self.send('post', POSTS, {'text': 'Новый'})
+        self.assertEqual(response.status_code, 401)
+        response = self.send(
+            'post', POSTS, {'text': 'Новый', 'group': 'cats'}, self.reader)
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(id=response.json()['id'])
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(response['Location'], reverse(
+            'api:post_detail', args=[post.id]))
+        url = reverse('api:post_detail', args=[post.id])
+        response = self.send('patch', url, {'text': 'Правка'})
+        self.assertEqual(response.json()['group'], 'cats')
+        self.assertEqual(Post.objects.get(id=post.id).text, 'Правка')
+        response = self.send('patch', url, {'text': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        response = self.send('patch', url, {'group': 'dogs'})
+        self.assertEqual(response.status_code, 400)
+        response = self.send(
+            'patch', reverse('api:post_detail', args=[self.posts[0].id]),
+            {'text': 'Чужой'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        self.assertEqual(self.client.put(url).status_code, 405)
+
+    def test_comments(self):
+        url = reverse('api:comments', args=[self.posts[0].id])
+        for text in ('Первый', 'Второй', 'Третий'):
+            response = self.send('post', url, {'text': text}, self.reader)
+            self.assertEqual(response.status_code, 201)
+        page = self.client.get(url).json()
+        self.assertEqual(
+            [comment['text'] for comment in page['results']],
+            ['Первый', 'Второй'])
+        page = self.client.get(page['next']).json()
+        self.assertEqual(page['results'][0]['author'], 'reader')
+        response = self.client.get(reverse('api:comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follows(self):
+        self.assertEqual(self.client.get(FOLLOWS).status_code, 401)
+        response = self.send(
+            'post', FOLLOWS, {'author': 'author'}, self.reader)
+        self.assertEqual(response.status_code, 201)
+        response = self.send('post', FOLLOWS, {'author': 'author'})
+        self.assertEqual(response.status_code, 200)
+        response = self.send('post', FOLLOWS, {'author': 'reader'})
+        self.assertEqual(response.status_code, 400)
+        page = self.client.get(FOLLOWS).json()
+        self.assertEqual(page['results'], [{'author': 'author'}])
+        response = self.client.delete(
+            reverse('api:follow_detail', args=['author']))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_csrf_required_for_session_writes(self):
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.force_login(self.reader)
+        response = self.send('post', POSTS, {'text': 'Новый'})
+        self.assertEqual(response.status_code, 403)
+        self.client.get(reverse('api:root'))
+        token = self.client.cookies['csrftoken'].value
+        response = self.client.post(
+            POSTS, json.dumps({'text': 'Новый'}),
+            content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
@@ -0,0 +1,154 @@
+"""Общее для JSON API: поля ответа, курсорные страницы и ошибки."""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse, QueryDict
+
+from posts.utils import CURSOR_ORDERING, CURSOR_PARAM, CursorPaginator
+
+FIELDS_PARAM = 'fields'
+LIMIT_PARAM = 'limit'
+MAX_LIMIT = 100
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+class ApiError(Exception):
+    def __init__(self, status, errors):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, safe=False, json_dumps_params=JSON_PARAMS)
+
+
+def api_view(*methods):
+    """Разрешённые методы и ошибки в JSON вместо HTML-страниц."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods + ('HEAD',) or (
+                    request.method == 'HEAD' and 'GET' not in methods):
+                response = json_response(
+                    {'errors': 'Метод не разрешён'}, status=405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return json_response(
+                    {'errors': error.errors}, status=error.status)
+            except Http404:
+                return json_response({'errors': 'Не найдено'}, status=404)
+        return wrapper
+    return decorator
+
+
+def require_login(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужно войти')
+
+
+def request_data(request):
+    """Данные запроса: JSON-объект, форма или multipart (и в PATCH)."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Некорректный JSON')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект')
+        return data, {}
+    if request.method == 'POST':
+        return request.POST.dict(), request.FILES
+    if request.content_type == 'multipart/form-data':
+        data, files = request.parse_file_upload(request.META, request)
+        return data.dict(), files
+    return QueryDict(request.body).dict(), {}
+
+
+def _file_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """Поля ответа: имя в API → колонка для values().
+
+    Ответ собирается из словарей values(), без объектов моделей;
+    ?fields=id,text выбирает из базы только нужные колонки.
+    """
+    converters = {'image': _file_url}
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def requested(self, request):
+        names = request.GET.get(FIELDS_PARAM)
+        if not names:
+            return list(self.fields)
+        names = [name.strip() for name in names.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(400, {FIELDS_PARAM: [
+                f'Неизвестные поля: {", ".join(unknown)}']})
+        return names
+
+    def columns(self, names, extra=()):
+        return list(dict.fromkeys(
+            [self.fields[name] for name in names] + list(extra)))
+
+    def serialize(self, row, names):
+        data = {}
+        for name in names:
+            value = row[self.fields[name]]
+            converter = self.converters.get(name)
+            data[name] = converter(value) if converter else value
+        return data
+
+    def one(self, request, queryset):
+        """Один объект; Http404, если его нет."""
+        names = self.requested(request)
+        rows = list(queryset.values(*self.columns(names))[:1])
+        if not rows:
+            raise Http404
+        return self.serialize(rows[0], names)
+
+    def page(self, request, queryset, ordering=CURSOR_ORDERING):
+        """Курсорная страница: results и ссылки next/previous."""
+        names = self.requested(request)
+        cursor_columns = [field.lstrip('-') for field in ordering]
+        paginator = CursorPaginator(
+            queryset.values(*self.columns(names, cursor_columns)),
+            _limit(request), ordering)
+        cursor = request.GET.get(CURSOR_PARAM, '')
+        # В HTML битый курсор открывает первую страницу, а клиенту API
+        # нужна ошибка: иначе он молча пойдёт по кругу.
+        if cursor and paginator.decode(cursor) is None:
+            raise ApiError(400, {CURSOR_PARAM: ['Некорректный курсор']})
+        page = paginator.cursor_page(cursor)
+        return {
+            'results': [self.serialize(row, names) for row in page],
+            'next': _page_link(request, page.next_cursor),
+            'previous': _page_link(request, page.previous_cursor),
+        }
+
+
+def _limit(request):
+    default = settings.CONSTANTS['POSTS_PER_PAGE']
+    try:
+        limit = int(request.GET.get(LIMIT_PARAM, default))
+    except ValueError:
+        raise ApiError(400, {LIMIT_PARAM: ['Ожидается число']})
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _page_link(request, cursor):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params[CURSOR_PARAM] = cursor
+    return request.build_absolute_uri(f'?{params.urlencode()}')
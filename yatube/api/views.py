@@ -0,0 +1,224 @@
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.csrf import ensure_csrf_cookie
+
+from core.db.routers import pin_to_primary
+from posts import caching
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.thumbnails import schedule_thumbnail
+from .utils import (
+    ApiError, Resource, api_view, json_response, request_data, require_login
+)
+
+POST = Resource(
+    id='id',
+    text='text',
+    pub_date='pub_date',
+    author='author__username',
+    group='group__slug',
+    image='image',
+    thumbnail='thumbnail_url',
+    comment_count='comment_count',
+)
+COMMENT = Resource(
+    id='id',
+    post='post_id',
+    author='author__username',
+    text='text',
+    created='created',
+)
+GROUP = Resource(
+    id='id',
+    title='title',
+    slug='slug',
+    description='description',
+)
+FOLLOW = Resource(
+    author='author__username',
+)
+COMMENT_ORDERING = ('created', 'id')
+GROUP_ORDERING = ('id',)
+# Подписки листаются по индексу (user, author) без сортировки.
+FOLLOW_ORDERING = ('author_id',)
+
+
+def posts_tags(request):
+    group = request.GET.get('group')
+    author = request.GET.get('author')
+    tags = [caching.group_tag(group)] if group else []
+    if author:
+        tags.append(caching.author_tag(author))
+    return tags or [caching.POSTS_TAG]
+
+
+def post_tags(request, post_id):
+    # В ответе имя автора и слаг группы: их смена тоже меняет ETag.
+    return caching.post_detail_tags(request, post_id)
+
+
+def groups_tags(request):
+    return [caching.POSTS_TAG]
+
+
+def group_tags(request, slug):
+    return [caching.group_tag(slug)]
+
+
+def follows_tags(request):
+    return [caching.author_tag(request.user.get_username())]
+
+
+def _post_form(request, post=None):
+    """Форма поста из запроса: группа в API задаётся слагом."""
+    data, files = request_data(request)
+    if data.get('group'):
+        data['group'] = Group.objects.filter(
+            slug=data['group']).values_list('pk', flat=True).first()
+        if data['group'] is None:
+            raise ApiError(400, {'group': ['Такой группы нет']})
+    if post is not None:
+        # PATCH: незаданные поля остаются прежними.
+        data = {'text': post.text, 'group': post.group_id, **data}
+    return PostForm(data, files=files or None, instance=post)
+
+
+def _write(request):
+    require_login(request)
+    pin_to_primary()
+
+
+@ensure_csrf_cookie
+@api_view('GET')
+def root(request):
+    """Список ресурсов; заодно ставит cookie csrftoken для записи."""
+    return json_response({
+        name: request.build_absolute_uri(reverse(f'api:{name}'))
+        for name in ('posts', 'groups', 'follows')
+    })
+
+
+@api_view('GET', 'POST')
+@caching.condition_tagged(posts_tags)
+def posts(request):
+    if request.method == 'POST':
+        return create_post(request)
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return json_response(POST.page(request, queryset))
+
+
+def create_post(request):
+    _write(request)
+    form = _post_form(request)
+    if not form.is_valid():
+        raise ApiError(400, form.errors)
+    with transaction.atomic():
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+    if post.image:
+        schedule_thumbnail(post)
+    response = json_response(
+        POST.one(request, Post.objects.filter(id=post.id)), status=201)
+    response['Location'] = reverse('api:post_detail', args=[post.id])
+    return response
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+@caching.condition_tagged(post_tags)
+def post_detail(request, post_id):
+    if request.method == 'GET':
+        return json_response(
+            POST.one(request, Post.objects.filter(id=post_id)))
+    _write(request)
+    post = get_object_or_404(Post, id=post_id)
+    if request.user != post.author:
+        raise ApiError(403, 'Изменять пост может только автор')
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            post.delete()
+        return HttpResponse(status=204)
+    form = _post_form(request, post)
+    if not form.is_valid():
+        raise ApiError(400, form.errors)
+    with transaction.atomic():
+        post = form.save(commit=False)
+        if 'image' in form.changed_data:
+            post.thumbnail_url = post.image_variants = ''
+        post.save()
+    if 'image' in form.changed_data and post.image:
+        schedule_thumbnail(post)
+    return json_response(POST.one(request, Post.objects.filter(id=post.id)))
+
+
+@api_view('GET', 'POST')
+@caching.condition_tagged(post_tags)
+def comments(request, post_id):
+    if request.method == 'POST':
+        _write(request)
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    if request.method == 'GET':
+        return json_response(COMMENT.page(
+            request, Comment.objects.filter(post=post), COMMENT_ORDERING))
+    form = CommentForm(request_data(request)[0])
+    if not form.is_valid():
+        raise ApiError(400, form.errors)
+    with transaction.atomic():
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+    return json_response(
+        COMMENT.one(request, Comment.objects.filter(id=comment.id)),
+        status=201)
+
+
+@api_view('GET')
+@caching.condition_tagged(groups_tags)
+def groups(request):
+    return json_response(
+        GROUP.page(request, Group.objects.all(), GROUP_ORDERING))
+
+
+@api_view('GET')
+@caching.condition_tagged(group_tags)
+def group_detail(request, slug):
+    return json_response(GROUP.one(request, Group.objects.filter(slug=slug)))
+
+
+@api_view('GET', 'POST')
+@caching.condition_tagged(follows_tags)
+def follows(request):
+    """Подписки текущего пользователя."""
+    if request.method == 'GET':
+        require_login(request)
+        return json_response(FOLLOW.page(
+            request, Follow.objects.filter(user=request.user),
+            FOLLOW_ORDERING))
+    _write(request)
+    username = request_data(request)[0].get('author')
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        raise ApiError(400, {'author': ['Такого автора нет']})
+    if author == request.user:
+        raise ApiError(400, {'author': ['Нельзя подписаться на себя']})
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(
+            user=request.user, author=author)
+    return json_response(
+        {'author': author.username}, status=201 if created else 200)
+
+
+@api_view('DELETE')
+def follow_detail(request, username):
+    _write(request)
+    author = get_object_or_404(User, username=username)
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
+    return HttpResponse(status=204)
@@ -0,0 +1,248 @@
+"""ASGI для Django 2.2: сеть — в цикле событий, Django — в пуле потоков.
+
+Django 2.2 не умеет ни ASGI, ни асинхронные вьюхи, поэтому
+ASGIHandler оборачивает обычный WSGI-обработчик. Весь обмен с клиентом
+асинхронный: тело запроса дочитывается, а готовый ответ отправляется
+без участия потоков, и медленный клиент держит только сокет. Сам
+запрос (middleware, вьюха, шаблоны, база) выполняется в пуле из
+ASGI_THREADS потоков — это и предел одновременных соединений с базой.
+Потоковые ответы (StreamingHttpResponse) отдаются из того же потока,
+где открыт курсор, и держат поток до конца отправки.
+
+serve() — минимальный HTTP/1.1-сервер на asyncio для разработки и
+бенчмарка; в продакшене приложение запускают uvicorn или daphne.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+# Тело запроса больше этого размера уходит из памяти во временный файл.
+BODY_MEMORY_LIMIT = 1024 * 1024
+HEADER_TIMEOUT = 30
+MAX_HEADERS = 100
+
+
+def build_environ(scope, body):
+    """WSGI environ из ASGI scope и уже прочитанного тела."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # PEP 3333: строки environ — байты, декодированные как latin-1.
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin1')
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    """ASGI-приложение поверх WSGI-приложения с пулом из threads потоков."""
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+        try:
+            start, chunks = await loop.run_in_executor(
+                self.executor, self.run, environ, send, loop)
+        finally:
+            body.close()
+        if start is not None:
+            await send(start)
+            for chunk in chunks:
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def run(self, environ, send, loop):
+        """Выполняется в пуле: обычный ответ собирается целиком и
+        отправляется уже после освобождения потока; потоковый
+        отправляется отсюда же, по частям."""
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+        result = self.wsgi_application(environ, start_response)
+        start = {'type': 'http.response.start', **started}
+        try:
+            if not getattr(result, 'streaming', False):
+                return start, [b''.join(result)]
+            asyncio.run_coroutine_threadsafe(send(start), loop).result()
+            for chunk in result:
+                asyncio.run_coroutine_threadsafe(send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                }), loop).result()
+            return None, []
+        finally:
+            # Сигнал request_finished закрывает соединения с базой
+            # этого потока по правилам CONN_MAX_AGE.
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def get_asgi_application(threads=None):
+    application = get_wsgi_application()
+    return ASGIHandler(application, threads or settings.ASGI_THREADS)
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode('latin1').split()
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise ValueError('Слишком много заголовков')
+        name, _, value = line.decode('latin1').partition(':')
+        headers.append((
+            name.strip().lower().encode('latin1'),
+            value.strip().encode('latin1'),
+        ))
+    return method, target, version, headers
+
+
+async def _handle_connection(application, reader, writer):
+    try:
+        request = await asyncio.wait_for(
+            _read_request(reader), HEADER_TIMEOUT)
+    except (asyncio.TimeoutError, ConnectionError, ValueError):
+        writer.close()
+        return
+    if request is None:
+        writer.close()
+        return
+    method, target, version, headers = request
+    length = int(dict(headers).get(b'content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    path, _, query = target.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': version.split('/', 1)[-1],
+        'method': method,
+        'scheme': 'http',
+        'path': unquote(path),
+        'raw_path': path.encode('latin1'),
+        'query_string': query.encode('latin1'),
+        'root_path': '',
+        'headers': headers,
+        'client': writer.get_extra_info('peername')[:2],
+        'server': writer.get_extra_info('sockname')[:2],
+    }
+    messages = [{'type': 'http.request', 'body': body}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # Тело уже отдано: дальше только ждём конца соединения.
+        await reader.read()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+            lines += [
+                f'{name.decode("latin1")}: {value.decode("latin1")}'
+                for name, value in message.get('headers', [])
+            ]
+            lines.append('Connection: close')
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin1'))
+        else:
+            writer.write(message.get('body', b''))
+        await writer.drain()
+
+    try:
+        await application(scope, receive, send)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def serve(application, host, port, ready=None):
+    """Запускает сервер до прерывания; ready() — когда порт открыт."""
+    async def main():
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle_connection(
+                application, reader, writer),
+            host, port, backlog=1024)
+        if ready is not None:
+            ready()
+        async with server:
+            await server.serve_forever()
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+"""Бэкенд кэша по текстовому протоколу memcached без сторонних библиотек.
+
+Реализует ту часть интерфейса клиента python-memcached, которая нужна
+BaseMemcachedCache, поэтому годится и для настоящего memcached, и для
+локальной заглушки (python manage.py memcached_standin).
+
+Сервер один: раскладки ключей по нескольким серверам нет, поэтому
+список серверов — ошибка настройки, а не молча используемый первый.
+"""
+import pickle
+import re
+import socket
+import sys
+import threading
+from hashlib import sha1
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.exceptions import ImproperlyConfigured
+
+FLAG_INT = 0
+FLAG_PICKLE = 1
+CONNECT_TIMEOUT = 3
+MAX_KEY_LENGTH = 250
+# Пробелы и управляющие символы разрывают строку текстового протокола.
+UNSAFE_KEY = re.compile(r'[\x00-\x20\x7f]')
+# Ответы, после которых состояние соединения неизвестно.
+ERROR_REPLIES = (b'ERROR', b'CLIENT_ERROR', b'SERVER_ERROR')
+
+
+class Client:
+    def __init__(self, servers, **options):
+        servers = [server for server in servers if server]
+        if len(servers) != 1:
+            raise ImproperlyConfigured(
+                'Бэкенд core.cache.memcached работает с одним сервером, '
+                f'указано: {servers}')
+        host, _, port = servers[0].rpartition(':')
+        self._address = (host or '127.0.0.1', int(port or 11211))
+        self._timeout = options.get('timeout', CONNECT_TIMEOUT)
+        self._local = threading.local()
+
+    @property
+    def _stream(self):
+        stream = getattr(self._local, 'stream', None)
+        if stream is None:
+            connection = socket.create_connection(
+                self._address, timeout=self._timeout)
+            stream = connection.makefile('rwb')
+            self._local.connection = connection
+            self._local.stream = stream
+        return stream
+
+    def _command(self, line, payload=None):
+        # Как и python-memcached, недоступный сервер превращаем в промах,
+        # а не в ошибку страницы. После ошибки протокола в соединении
+        # могут остаться непрочитанные строки: оно закрывается, иначе
+        # они сдвинут ответы на следующие команды.
+        try:
+            stream = self._stream
+            stream.write(line.encode() + b'\r\n')
+            if payload is not None:
+                stream.write(payload + b'\r\n')
+            stream.flush()
+            reply = stream.readline().rstrip(b'\r\n')
+        except OSError:
+            reply = b''
+        if not reply or reply.startswith(ERROR_REPLIES):
+            self.disconnect_all()
+            return b''
+        return reply
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return FLAG_INT, str(value).encode()
+        return FLAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(flags, payload):
+        if flags == FLAG_INT:
+            return int(payload)
+        return pickle.loads(payload)
+
+    def _store(self, verb, key, value, timeout):
+        flags, payload = self._encode(value)
+        reply = self._command(
+            f'{verb} {key} {flags} {timeout} {len(payload)}', payload)
+        return reply == b'STORED'
+
+    def set(self, key, value, timeout=0):
+        return self._store('set', key, value, timeout)
+
+    def add(self, key, value, timeout=0):
+        return self._store('add', key, value, timeout)
+
+    def get_multi(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = {}
+        try:
+            stream = self._stream
+            stream.write(('get ' + ' '.join(keys)).encode() + b'\r\n')
+            stream.flush()
+            while True:
+                line = stream.readline().rstrip(b'\r\n')
+                if line == b'END':
+                    return values
+                verb, key, flags, size = line.split()
+                payload = stream.read(int(size) + 2)
+                if verb != b'VALUE' or not payload.endswith(b'\r\n'):
+                    raise ValueError(line)
+                values[key.decode()] = self._decode(int(flags), payload[:-2])
+        except Exception:
+            # Обрыв, непонятный ответ или значение, которое не
+            # распаковать: всё считается промахом.
+            self.disconnect_all()
+            return {}
+
+    def get(self, key):
+        return self.get_multi([key]).get(key)
+
+    def set_multi(self, mapping, timeout=0):
+        return [
+            key for key, value in mapping.items()
+            if not self.set(key, value, timeout)
+        ]
+
+    def delete(self, key):
+        return self._command(f'delete {key}') == b'DELETED'
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def _change(self, verb, key, delta):
+        reply = self._command(f'{verb} {key} {delta}')
+        if not reply.isdigit():
+            raise ValueError(key)
+        return int(reply)
+
+    def incr(self, key, delta=1):
+        return self._change('incr', key, delta)
+
+    def decr(self, key, delta=1):
+        return self._change('decr', key, delta)
+
+    def touch(self, key, timeout=0):
+        return self._command(f'touch {key} {timeout}') == b'TOUCHED'
+
+    def flush_all(self):
+        self._command('flush_all')
+
+    def disconnect_all(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.stream.close()
+            connection.close()
+            self._local.connection = self._local.stream = None
+
+
+class MemcachedCache(BaseMemcachedCache):
+    def __init__(self, server, params):
+        super().__init__(
+            server, params, library=sys.modules[__name__],
+            value_not_found_exception=ValueError
+        )
+
+    def make_key(self, key, version=None):
+        """Ключ, допустимый в протоколе: длинные ключи и ключи с
+        пробелами (в них попадают части адресов) заменяются хэшем."""
+        key = super().make_key(key, version=version)
+        raw = key.encode()
+        if len(raw) > MAX_KEY_LENGTH or UNSAFE_KEY.search(key):
+            key = f'{self.key_prefix}:sha1:{sha1(raw).hexdigest()}'
+        return key
+
+    def validate_key(self, key):
+        # make_key уже привёл ключ к допустимому виду.
+        pass
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        return self._cache.touch(key, self.get_backend_timeout(timeout))
@@ -0,0 +1,137 @@
+"""Локальная заглушка memcached для тестов и разработки.
+
+Понимает команды get, set, add, delete, incr, decr, touch и flush_all
+текстового протокола — ровно то, чем пользуется core.cache.memcached.
+"""
+import socketserver
+import threading
+import time
+
+THIRTY_DAYS = 60 * 60 * 24 * 30
+
+
+class _Storage:
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def expires(exptime):
+        exptime = int(exptime)
+        if exptime == 0:
+            return None
+        if exptime < 0:
+            return 0
+        if exptime > THIRTY_DAYS:
+            return exptime
+        return time.time() + exptime
+
+    def alive(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        if item[2] is not None and item[2] <= time.time():
+            del self.items[key]
+            return None
+        return item
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, *args = line.decode().split()
+            handler = getattr(self, f'do_{command}', None)
+            if handler is None:
+                self.reply(b'ERROR')
+                continue
+            with self.server.storage.lock:
+                handler(*args)
+
+    def reply(self, data):
+        self.wfile.write(data + b'\r\n')
+
+    def do_get(self, *keys):
+        for key in keys:
+            item = self.server.storage.alive(key)
+            if item is not None:
+                flags, payload, _ = item
+                self.reply(
+                    f'VALUE {key} {flags} {len(payload)}'.encode())
+                self.reply(payload)
+        self.reply(b'END')
+
+    def _store(self, key, flags, exptime, size):
+        payload = self.rfile.read(int(size) + 2)[:-2]
+        return (int(flags), payload, self.server.storage.expires(exptime))
+
+    def do_set(self, key, *args):
+        self.server.storage.items[key] = self._store(key, *args)
+        self.reply(b'STORED')
+
+    def do_add(self, key, *args):
+        item = self._store(key, *args)
+        if self.server.storage.alive(key) is not None:
+            self.reply(b'NOT_STORED')
+            return
+        self.server.storage.items[key] = item
+        self.reply(b'STORED')
+
+    def do_delete(self, key):
+        if self.server.storage.alive(key) is None:
+            self.reply(b'NOT_FOUND')
+            return
+        del self.server.storage.items[key]
+        self.reply(b'DELETED')
+
+    def _change(self, key, delta):
+        item = self.server.storage.alive(key)
+        if item is None:
+            self.reply(b'NOT_FOUND')
+            return
+        flags, payload, expires = item
+        value = max(int(payload) + delta, 0)
+        self.server.storage.items[key] = (
+            flags, str(value).encode(), expires)
+        self.reply(str(value).encode())
+
+    def do_incr(self, key, delta):
+        self._change(key, int(delta))
+
+    def do_decr(self, key, delta):
+        self._change(key, -int(delta))
+
+    def do_touch(self, key, exptime):
+        item = self.server.storage.alive(key)
+        if item is None:
+            self.reply(b'NOT_FOUND')
+            return
+        self.server.storage.items[key] = (
+            item[0], item[1], self.server.storage.expires(exptime))
+        self.reply(b'TOUCHED')
+
+    def do_flush_all(self, *args):
+        self.server.storage.items.clear()
+        self.reply(b'OK')
+
+
+class MemcachedStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, _Handler)
+        self.storage = _Storage()
+
+    @property
+    def location(self):
+        host, port = self.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self):
+        """Запускает сервер в фоновом потоке, удобно для тестов."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
@@ -0,0 +1,69 @@
+"""Чтение с реплик, запись и «свежие» чтения — с основной базы.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. Запрос закрепляется
+за основной базой (pin) небезопасным методом, вьюхой под use_primary,
+любой записью через ORM или свежей кукой. После запроса, который что-то
+записал, PrimaryPinningMiddleware ставит куку, и ещё DATABASE_REPLICA_LAG
+секунд все запросы этого браузера читают с основной базы: пользователь
+сразу видит свой комментарий или подписку, даже если реплика отстаёт.
+
+Вне запросов (миграции, команды, фоновые потоки) реплики не
+используются вовсе: их разрешает только middleware.
+"""
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def pin_to_primary():
+    _state.pinned = True
+
+
+def allow_replicas():
+    _state.pinned = False
+    _state.wrote = False
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', True)
+
+
+def wrote_to_primary():
+    return getattr(_state, 'wrote', False)
+
+
+def use_primary(view):
+    """Вьюха целиком — и чтения, и записи — работает с основной базой."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        pin_to_primary()
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or is_pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Записи вне use_primary тоже закрепляют запрос: дальнейшие
+        # чтения в нём должны видеть только что записанное.
+        pin_to_primary()
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все базы — копии одной и той же.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплики получают от основной базы.
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,34 @@
+"""SQLite с настройками для нескольких воркеров.
+
+Помимо обычных OPTIONS sqlite3 понимает ещё два ключа:
+
+* pragmas — словарь PRAGMA, выполняемых на каждом новом соединении
+  (journal_mode=WAL, synchronous=NORMAL, cache_size и т. п.);
+* transaction_mode — режим BEGIN для transaction.atomic. IMMEDIATE
+  берёт блокировку записи сразу: иначе транзакция, которая сначала
+  читает, а потом пишет, получает «database is locked», не дожидаясь
+  busy timeout.
+"""
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        mode = params.pop('transaction_mode', 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ValueError(f'Неизвестный transaction_mode: {mode}')
+        self.transaction_mode = mode
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,250 @@
+"""Замеры запроса: SQL, кэш, шаблоны и произвольные счётчики.
+
+Профиль живёт в thread-local и заполняется, только пока идёт
+выбранный в выборку запрос (см. InstrumentationMiddleware); в
+остальное время обёртки сводятся к одной проверке. Сводка по
+именам вьюх копится в кэше, как статистика кэша страниц.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = 'instrumentation:'
+VIEWS_KEY = STATS_PREFIX + 'views'
+# Времена копятся в микросекундах: incr работает только с целыми.
+METRICS = (
+    'requests', 'queries', 'duplicates', 'sql_us', 'cache_hits',
+    'cache_misses', 'cache_us', 'template_us', 'total_us', 'over_budget',
+)
+CACHE_METHODS = (
+    'get', 'get_many', 'get_or_set', 'set', 'set_many', 'add', 'incr',
+    'decr', 'delete', 'delete_many', 'has_key', 'touch',
+)
+
+_local = threading.local()
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.cache_calls = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.templates = 0
+        self.template_time = 0.0
+        self.counters = Counter()
+        self._cache_depth = 0
+        self._template_depth = 0
+
+    @property
+    def duplicates(self):
+        """Сколько запросов повторили уже выполненный SQL с теми же
+        параметрами."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def duplicated_sql(self):
+        return [
+            sql for (sql, _), count in self.statements.most_common()
+            if count > 1
+        ]
+
+    def server_timing(self):
+        metrics = [
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.queries} queries, {self.duplicates} dup"',
+            f'cache;dur={self.cache_time * 1000:.1f};'
+            f'desc="{self.cache_hits} hit, {self.cache_misses} miss"',
+            f'tpl;dur={self.template_time * 1000:.1f};'
+            f'desc="{self.templates} renders"',
+        ]
+        metrics += [
+            f'{name};desc="{count}"'
+            for name, count in sorted(self.counters.items())
+        ]
+        metrics.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+def current():
+    return getattr(_local, 'profile', None)
+
+
+def record(name, amount=1):
+    """Произвольный счётчик текущего запроса (миниатюры и т. п.)."""
+    profile = current()
+    if profile is not None:
+        profile.counters[name] += amount
+
+
+def _execute(execute, sql, params, many, context):
+    profile = current()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_time += time.perf_counter() - started
+        profile.queries += 1
+        profile.statements[sql, repr(params)] += 1
+
+
+def _cache_method(name, method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = current()
+        # Вложенные вызовы (get внутри get_or_set) не считаем дважды.
+        if profile is None or profile._cache_depth:
+            return method(*args, **kwargs)
+        profile._cache_depth += 1
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            profile._cache_depth -= 1
+            profile.cache_time += time.perf_counter() - started
+            profile.cache_calls += 1
+        if name == 'get':
+            default = args[1] if len(args) > 1 else kwargs.get('default')
+            if result is default:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        elif name == 'get_many':
+            profile.cache_hits += len(result)
+            profile.cache_misses += len(args[0]) - len(result)
+        return result
+    return wrapper
+
+
+def _instrument_cache(backend):
+    # Бэкенды кэша свои в каждом потоке: оборачиваем сам экземпляр.
+    if getattr(backend, '_instrumented', False):
+        return
+    for name in CACHE_METHODS:
+        setattr(backend, name, _cache_method(name, getattr(backend, name)))
+    backend._instrumented = True
+
+
+def _instrument_templates():
+    render = Template.render
+    if getattr(render, '_instrumented', False):
+        return
+
+    @wraps(render)
+    def instrumented_render(self, context=None, request=None):
+        profile = current()
+        if profile is None:
+            return render(self, context, request)
+        profile.templates += 1
+        # Время считаем по внешнему шаблону: вложенные входят в него.
+        if profile._template_depth:
+            return render(self, context, request)
+        profile._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            profile._template_depth -= 1
+            profile.template_time += time.perf_counter() - started
+    instrumented_render._instrumented = True
+    Template.render = instrumented_render
+
+
+def install():
+    _instrument_templates()
+
+
+@contextmanager
+def profiling():
+    """Собирает профиль всего, что выполняется внутри блока."""
+    profile = Profile()
+    _instrument_cache(caches['default'])
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_execute))
+        _local.profile = profile
+        try:
+            yield profile
+        finally:
+            _local.profile = None
+            profile.total = time.perf_counter() - profile.started
+
+
+def _incr(key, amount):
+    if not amount:
+        return
+    if not cache.add(key, amount, None):
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.set(key, amount, None)
+
+
+def report(view, profile):
+    """Добавляет профиль в сводку и пишет в лог нарушения бюджета."""
+    budget = settings.QUERY_BUDGETS.get(view, settings.QUERY_BUDGET)
+    over_budget = profile.queries > budget
+    if over_budget or profile.duplicates:
+        logger.warning(
+            '%s: SQL-запросов %s при бюджете %s, повторов %s%s',
+            view, profile.queries, budget, profile.duplicates,
+            ''.join(f'\n  {sql}' for sql in profile.duplicated_sql()),
+        )
+    if cache.add(f'{STATS_PREFIX}{view}:requests', 0, None):
+        views = cache.get(VIEWS_KEY, [])
+        cache.set(VIEWS_KEY, sorted({*views, view}), None)
+    values = {
+        'requests': 1,
+        'queries': profile.queries,
+        'duplicates': profile.duplicates,
+        'sql_us': int(profile.sql_time * 1e6),
+        'cache_hits': profile.cache_hits,
+        'cache_misses': profile.cache_misses,
+        'cache_us': int(profile.cache_time * 1e6),
+        'template_us': int(profile.template_time * 1e6),
+        'total_us': int(profile.total * 1e6),
+        'over_budget': int(over_budget),
+    }
+    for metric, amount in values.items():
+        _incr(f'{STATS_PREFIX}{view}:{metric}', amount)
+
+
+def stats():
+    """Сводка по вьюхам: {имя вьюхи: {метрика: сумма}}."""
+    views = cache.get(VIEWS_KEY, [])
+    keys = [
+        f'{STATS_PREFIX}{view}:{metric}'
+        for view in views for metric in METRICS
+    ]
+    values = cache.get_many(keys)
+    return {
+        view: {
+            metric: values.get(f'{STATS_PREFIX}{view}:{metric}', 0)
+            for metric in METRICS
+        }
+        for view in views
+    }
+
+
+def reset():
+    views = cache.get(VIEWS_KEY, [])
+    cache.delete_many([
+        f'{STATS_PREFIX}{view}:{metric}'
+        for view in views for metric in METRICS
+    ] + [VIEWS_KEY])
@@ -0,0 +1,128 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from core.benchmarks import LatencyStats, percentile
+
+ALIAS = 'benchmark'
+ROWS = 10000
+AUTHORS = 100
+
+
+def _read():
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute(
+            'SELECT id, body FROM bench_post WHERE author = %s '
+            'ORDER BY id DESC LIMIT 10', [random.randrange(AUTHORS)])
+        cursor.fetchall()
+
+
+def _write():
+    # Как во вьюхах: в транзакции сначала чтение, потом запись.
+    with transaction.atomic(using=ALIAS):
+        with connections[ALIAS].cursor() as cursor:
+            author = random.randrange(AUTHORS)
+            cursor.execute(
+                'SELECT COUNT(*) FROM bench_post WHERE author = %s',
+                [author])
+            cursor.execute(
+                'INSERT INTO bench_post (author, body) VALUES (%s, %s)',
+                [author, 'x' * 200])
+
+
+def _worker(operation, stats, deadline):
+    connection = connections[ALIAS]
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            operation()
+        except OperationalError:
+            stats.add()
+        else:
+            stats.add(time.monotonic() - started)
+        # Граница запроса: соединение закрывается, если так велит
+        # CONN_MAX_AGE профиля.
+        connection.close_if_unusable_or_obsolete()
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает профили базы (DATABASE_PROFILES) на параллельных '
+            'чтениях и записях во временном файле SQLite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profiles', nargs='*', default=['sqlite', 'sqlite-wal'])
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        for profile in options['profiles']:
+            config = settings.DATABASE_PROFILES.get(profile)
+            if config is None:
+                raise CommandError(f'Нет профиля {profile}')
+            if 'sqlite' not in config['ENGINE']:
+                raise CommandError(f'{profile}: бенчмарк только для SQLite')
+        self.stdout.write(
+            f'{"профиль":<12} {"операция":<8} {"в сек.":>8} '
+            f'{"p50, мс":>8} {"p95, мс":>8} {"ошибок":>7}')
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                self.run_profile(profile, directory, options)
+
+    def run_profile(self, profile, directory, options):
+        connections.databases[ALIAS] = {
+            **settings.DATABASE_PROFILES[profile],
+            'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+        }
+        connections.ensure_defaults(ALIAS)
+        connections.prepare_test_settings(ALIAS)
+        try:
+            self.fill()
+            reads, writes = LatencyStats(), LatencyStats()
+            deadline = time.monotonic() + options['seconds']
+            threads = [
+                threading.Thread(target=_worker, args=(_read, reads, deadline))
+                for _ in range(options['readers'])
+            ] + [
+                threading.Thread(
+                    target=_worker, args=(_write, writes, deadline))
+                for _ in range(options['writers'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for name, stats in (('чтение', reads), ('запись', writes)):
+                self.report(profile, name, stats, options['seconds'])
+        finally:
+            connections[ALIAS].close()
+            del connections[ALIAS]
+            del connections.databases[ALIAS]
+
+    def fill(self):
+        with transaction.atomic(using=ALIAS):
+            with connections[ALIAS].cursor() as cursor:
+                cursor.execute(
+                    'CREATE TABLE bench_post (id INTEGER PRIMARY KEY, '
+                    'author INTEGER NOT NULL, body TEXT NOT NULL)')
+                cursor.execute(
+                    'CREATE INDEX bench_post_author ON bench_post (author)')
+                cursor.executemany(
+                    'INSERT INTO bench_post (author, body) VALUES (%s, %s)',
+                    [(number % AUTHORS, 'x' * 200) for number in range(ROWS)])
+
+    def report(self, profile, name, stats, seconds):
+        self.stdout.write(
+            f'{profile:<12} {name:<8} '
+            f'{len(stats.latencies) / seconds:>8.0f} '
+            f'{percentile(stats.latencies, 0.5) * 1000:>8.2f} '
+            f'{percentile(stats.latencies, 0.95) * 1000:>8.2f} '
+            f'{stats.errors:>7}')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core import instrumentation
+
+
+class Command(BaseCommand):
+    help = ('Показывает средние замеры по вьюхам: SQL-запросы и их время, '
+            'повторы, попадания в кэш, время шаблонов и превышения бюджета.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить сводку.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            instrumentation.reset()
+            return
+        self.stdout.write(
+            f'{"вьюха":<24} {"запр.":>6} {"SQL":>5} {"SQL, мс":>8} '
+            f'{"повт.":>6} {"кэш, %":>7} {"шабл., мс":>9} '
+            f'{"всего, мс":>9} {"сверх":>6}')
+        for view, metrics in instrumentation.stats().items():
+            requests = metrics['requests'] or 1
+            lookups = metrics['cache_hits'] + metrics['cache_misses']
+            hit_rate = metrics['cache_hits'] * 100 / lookups if lookups else 0
+            self.stdout.write(
+                f'{view:<24} {metrics["requests"]:>6} '
+                f'{metrics["queries"] / requests:>5.1f} '
+                f'{metrics["sql_us"] / requests / 1000:>8.1f} '
+                f'{metrics["duplicates"] / requests:>6.1f} '
+                f'{hit_rate:>7.0f} '
+                f'{metrics["template_us"] / requests / 1000:>9.1f} '
+                f'{metrics["total_us"] / requests / 1000:>9.1f} '
+                f'{metrics["over_budget"]:>6}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.cache.standin import MemcachedStandIn
+
+
+class Command(BaseCommand):
+    help = 'Запускает заглушку memcached для CACHE_BACKEND=memcached.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=11211)
+
+    def handle(self, *args, **options):
+        server = MemcachedStandIn((options['host'], options['port']))
+        self.stdout.write(f'Заглушка memcached слушает {server.location}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,221 @@
+import json
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from importlib import import_module
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import instrumentation
+from core.benchmarks import percentile
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+ROUTE_MODULES = ('posts.urls', 'about.urls')
+ROLES = ('anonymous', 'user')
+# GET на эти адреса меняет данные (подписка, отписка) или выгружает
+# весь архив пользователя: замеры не должны портить базу.
+SKIPPED_ROUTES = {
+    'posts:profile_follow', 'posts:profile_unfollow', 'posts:export_data',
+}
+# Ниже этой разницы p95 считается шумом, а не регрессией.
+NOISE_MS = 1.0
+
+
+def _routes():
+    for module_name in ROUTE_MODULES:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            if name in SKIPPED_ROUTES:
+                continue
+            yield name, list(pattern.pattern.converters)
+
+
+def _commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет адреса posts.urls и about.urls, кроме меняющих '
+            'данные (гость и пользователь): перцентили задержки, '
+            'SQL-запросы, кэш и пик памяти. Пишет JSON для сравнения '
+            'коммитов (--compare). Данные для замеров создаёт '
+            'seed_benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument('--output', help='Файл для JSON вместо stdout.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона: найти регрессии.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 при сравнении (доля).')
+
+    def handle(self, *args, **options):
+        sample = self.sample()
+        instrumentation.install()
+        clients = {'anonymous': Client(), 'user': Client()}
+        clients['user'].force_login(sample['user'])
+        results = []
+        # В DEBUG Django копит все SQL-запросы в памяти: это исказило бы
+        # и время, и память.
+        with override_settings(DEBUG=False):
+            for name, arguments in _routes():
+                for role in ROLES:
+                    path = self.path(name, arguments, role, sample)
+                    if path is None:
+                        continue
+                    results.append({
+                        'route': name,
+                        'role': role,
+                        'path': path,
+                        **self.measure(clients[role], path, options),
+                    })
+        report = {
+            'commit': _commit(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'data': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'options': {
+                key: options[key] for key in ('requests', 'warmup', 'cold')
+            },
+            'results': results,
+        }
+        document = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(document + '\n')
+        else:
+            self.stdout.write(document)
+        if options['compare']:
+            self.compare(report, options['compare'], options['threshold'])
+
+    def sample(self):
+        """Самые тяжёлые объекты: популярный автор, активный читатель,
+        крупная группа и пост с самым длинным обсуждением."""
+        counters = UserCounters.objects.select_related('user')
+        author = counters.order_by('-followers_count').first()
+        reader = counters.order_by('-following_count').first()
+        post = Post.objects.order_by('-comment_count').first()
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        if None in (author, reader, post, group):
+            raise CommandError('База пуста: сначала seed_benchmark')
+        words = [word for word in post.text.split() if len(word) > 4]
+        return {
+            'user': reader.user,
+            'username': author.user.username,
+            'slug': group.slug,
+            'post_id': post.id,
+            'own_post_id': Post.objects.filter(
+                author=reader.user).values_list('id', flat=True).first(),
+            'query': words[0].strip('.,') if words else post.text[:10],
+        }
+
+    def path(self, name, arguments, role, sample):
+        kwargs = {argument: sample[argument] for argument in arguments}
+        if name == 'posts:post_edit' and role == 'user':
+            if sample['own_post_id'] is None:
+                return None
+            kwargs['post_id'] = sample['own_post_id']
+        path = reverse(name, kwargs=kwargs)
+        if name == 'posts:search':
+            path += f'?q={sample["query"]}'
+        return path
+
+    def measure(self, client, path, options):
+        for _ in range(options['warmup']):
+            client.get(path)
+        profiles = []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            with instrumentation.profiling() as profile:
+                response = client.get(path)
+            profiles.append(profile)
+        if options['cold']:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            client.get(path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        totals = [profile.total for profile in profiles]
+        queries = [profile.queries for profile in profiles]
+        return {
+            'status': response.status_code,
+            'requests': len(profiles),
+            'p50_ms': _ms(percentile(totals, 0.5)),
+            'p95_ms': _ms(percentile(totals, 0.95)),
+            'p99_ms': _ms(percentile(totals, 0.99)),
+            'mean_ms': _ms(statistics.mean(totals)),
+            'queries': statistics.median(queries),
+            'queries_max': max(queries),
+            'duplicates_max': max(profile.duplicates for profile in profiles),
+            'sql_ms': _ms(statistics.mean(
+                profile.sql_time for profile in profiles)),
+            'template_ms': _ms(statistics.mean(
+                profile.template_time for profile in profiles)),
+            'cache_hits': statistics.mean(
+                profile.cache_hits for profile in profiles),
+            'cache_misses': statistics.mean(
+                profile.cache_misses for profile in profiles),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, report, baseline_path, threshold):
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = {
+                (result['route'], result['role']): result
+                for result in json.load(file)['results']
+            }
+        regressions = []
+        for result in report['results']:
+            before = baseline.get((result['route'], result['role']))
+            if before is None:
+                continue
+            label = f'{result["route"]} ({result["role"]})'
+            limit = before['p95_ms'] * (1 + threshold)
+            if (result['p95_ms'] > limit
+                    and result['p95_ms'] - before['p95_ms'] > NOISE_MS):
+                regressions.append(
+                    f'{label}: p95 {before["p95_ms"]} → {result["p95_ms"]} мс')
+            if result['queries_max'] > before['queries_max']:
+                regressions.append(
+                    f'{label}: SQL-запросов {before["queries_max"]} → '
+                    f'{result["queries_max"]}')
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import get_asgi_application, serve
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PoolWSGIServer(WSGIServer):
+    """WSGI-сервер с пулом потоков, как синхронные воркеры: поток занят
+    соединением от чтения запроса до отправки последнего байта."""
+    request_queue_size = 1024
+
+    def __init__(self, address, threads):
+        super().__init__(address, QuietHandler)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_in_thread, request, client_address)
+
+    def process_in_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class Command(BaseCommand):
+    help = ('Запускает проект под ASGI или WSGI с пулом из --threads '
+            'потоков — для разработки и serve_benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interface', choices=('asgi', 'wsgi'), default='asgi')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument(
+            '--threads', type=int, default=settings.ASGI_THREADS)
+
+    def handle(self, *args, **options):
+        address = f'http://{options["host"]}:{options["port"]}/'
+
+        def ready():
+            self.stdout.write(
+                f'{options["interface"]}: {address}', ending='\n')
+            self.stdout.flush()
+        if options['interface'] == 'asgi':
+            serve(
+                get_asgi_application(options['threads']),
+                options['host'], options['port'], ready)
+            return
+        server = PoolWSGIServer(
+            (options['host'], options['port']), options['threads'])
+        server.set_app(get_wsgi_application())
+        ready()
+        server.serve_forever()
@@ -0,0 +1,131 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import LatencyStats, percentile
+
+HOST = '127.0.0.1'
+STARTUP_TIMEOUT = 30
+CLIENT_TIMEOUT = 5
+# Медленный клиент досылает по строке заголовка раз в столько секунд
+# и так и не заканчивает запрос (slow loris).
+SLOW_INTERVAL = 1
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске')
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError('Сервер не открыл порт')
+
+
+def _client(port, path, stats, deadline):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        connection = http.client.HTTPConnection(
+            HOST, port, timeout=CLIENT_TIMEOUT)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+        except OSError:
+            stats.add()
+        else:
+            stats.add(
+                time.monotonic() - started
+                if response.status == 200 else None)
+        finally:
+            connection.close()
+
+
+def _slow_client(port, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=1) as sock:
+                sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n')
+                while time.monotonic() < deadline:
+                    time.sleep(SLOW_INTERVAL)
+                    sock.sendall(b'X-Slow: 1\r\n')
+        except OSError:
+            time.sleep(SLOW_INTERVAL)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ASGI и WSGI с одинаковым пулом потоков под '
+            'нагрузкой обычных и медленных клиентов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'interfaces', nargs='*', default=['wsgi', 'asgi'])
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument('--slow-clients', type=int, default=16)
+        parser.add_argument(
+            '--threads', type=int, default=settings.ASGI_THREADS)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"сервер":<6} {"в сек.":>8} {"p50, мс":>8} {"p95, мс":>8} '
+            f'{"p99, мс":>8} {"ошибок":>7}')
+        for interface in options['interfaces']:
+            self.run_interface(interface, options)
+
+    def run_interface(self, interface, options):
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+             'serve', f'--interface={interface}', f'--port={port}',
+             f'--threads={options["threads"]}'],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port, process)
+            stats = LatencyStats()
+            deadline = time.monotonic() + options['seconds']
+            threads = [
+                threading.Thread(
+                    target=_slow_client, args=(port, deadline), daemon=True)
+                for _ in range(options['slow_clients'])
+            ] + [
+                threading.Thread(
+                    target=_client,
+                    args=(port, options['path'], stats, deadline))
+                for _ in range(options['clients'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.report(interface, stats, options['seconds'])
+        finally:
+            process.terminate()
+            process.wait()
+
+    def report(self, interface, stats, seconds):
+        latencies = stats.latencies
+        self.stdout.write(
+            f'{interface:<6} {len(latencies) / seconds:>8.0f} '
+            f'{percentile(latencies, 0.5) * 1000:>8.1f} '
+            f'{percentile(latencies, 0.95) * 1000:>8.1f} '
+            f'{percentile(latencies, 0.99) * 1000:>8.1f} '
+            f'{stats.errors:>7}')
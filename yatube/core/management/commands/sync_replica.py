@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик '
+            '(DB_REPLICAS) — замена репликации для локальной работы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять каждые N секунд, имитируя отставание реплики',
+        )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if 'sqlite' not in primary['ENGINE']:
+            raise CommandError('Копировать можно только SQLite')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: укажите DB_REPLICAS')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                self.copy(primary['NAME'], settings.DATABASES[alias]['NAME'])
+                self.stdout.write(f'{alias} обновлена')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def copy(source_name, target_name):
+        # backup() даёт согласованный снимок даже во время записи в WAL.
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,62 @@
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import instrumentation
+from core.db.routers import allow_replicas, pin_to_primary, wrote_to_primary
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PrimaryPinningMiddleware:
+    """Закрепляет запросы за основной базой (см. core.db.routers).
+
+    Ставится перед SessionMiddleware, чтобы учесть и запись сессии.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        allow_replicas()
+        if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            pin_to_primary()
+        try:
+            response = self.get_response(request)
+            if settings.DATABASE_REPLICAS and wrote_to_primary():
+                response.set_cookie(
+                    PIN_COOKIE, '1',
+                    max_age=settings.DATABASE_REPLICA_LAG,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            pin_to_primary()
+        return response
+
+
+class InstrumentationMiddleware:
+    """Замеры доли INSTRUMENTATION_SAMPLE_RATE запросов (core.instrumentation).
+
+    Отдаёт их в заголовке Server-Timing, копит сводку по вьюхам (команда
+    instrumentation_stats) и пишет в лог превышения QUERY_BUDGETS и
+    повторные SQL-запросы. Ставится первым, чтобы учесть и сессию.
+    При нулевой доле выключается целиком.
+    """
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrumentation.install()
+
+    def __call__(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+        with instrumentation.profiling() as profile:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        response['Server-Timing'] = profile.server_timing()
+        instrumentation.report(view, profile)
+        return response
@@ -0,0 +1,95 @@
+"""Помощники для тестов, общие для всех приложений."""
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+# Признаки плохого плана: чтение всей таблицы и сортировка во временной
+# структуре. «SCAN t USING INDEX» в SQLite — это обход индекса в нужном
+# порядке (с LIMIT он останавливается рано), его не считаем полным.
+BAD_PLAN_PATTERNS = {
+    'sqlite': (
+        re.compile(r'\bSCAN (?:TABLE )?(?!CONSTANT ROW)\w+(?! USING)(?:\s|$)'),
+        re.compile(r'USE TEMP B-TREE'),
+    ),
+    'postgresql': (
+        re.compile(r'Seq Scan on'),
+        re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE),
+    ),
+}
+EXPLAIN_PREFIX = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+# В PostgreSQL на маленьких тестовых таблицах планировщик честно выберет
+# Seq Scan, поэтому запрещаем его, и план покажет, есть ли подходящий индекс.
+POSTGRESQL_PLAN_SETTINGS = (
+    'SET LOCAL enable_seqscan = off',
+    'SET LOCAL enable_sort = off',
+)
+
+
+@contextmanager
+def run_on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет on_commit-колбэки, поставленные внутри блока.
+
+    TestCase не коммитит транзакцию теста, поэтому задачи очереди в
+    режиме JOBS_EAGER сами не выполнятся. То же, что
+    captureOnCommitCallbacks(execute=True) из Django 3.2; колбэки,
+    поставленные колбэками, тоже выполняются.
+    """
+    database = connections[using]
+    start = len(database.run_on_commit)
+    yield
+    # Список перечитывается: откат точки сохранения заменяет его.
+    while start < len(database.run_on_commit):
+        _, callback = database.run_on_commit[start]
+        start += 1
+        callback()
+
+
+def explain(sql, params=()):
+    """План запроса текстом, по строке на узел."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRESQL_PLAN_SETTINGS:
+                cursor.execute(statement)
+        cursor.execute(EXPLAIN_PREFIX[connection.vendor] + sql, params)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+class QueryPlanMixin:
+    """Проверки, что запросы обслуживаются индексами.
+
+    assertIndexedPlan(queryset) проверяет один queryset,
+    assertIndexedQueries(captured) — всё, что записал
+    CaptureQueriesContext, например запросы страницы с prefetch.
+    """
+
+    def _check_plan(self, sql, params=()):
+        patterns = BAD_PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            self.skipTest(f'Нет разбора планов для {connection.vendor}')
+        plan = explain(sql, params)
+        for pattern in patterns:
+            if pattern.search(plan):
+                self.fail(
+                    f'Полное чтение или сортировка в плане:\n{plan}\n'
+                    f'для запроса:\n{sql}')
+        return plan
+
+    def assertIndexedPlan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        return self._check_plan(sql, params)
+
+    def assertIndexedQueries(self, captured_queries):
+        selects = [
+            query['sql'] for query in captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertTrue(selects, 'Не записано ни одного SELECT')
+        for sql in selects:
+            self._check_plan(sql)
@@ -1,4 +1,40 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import http.client
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Max, Min
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, SimpleTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import instrumentation
+from core.admin import IndexedDatesQuerySet
+from core.asgi import ASGIHandler, get_asgi_application, serve
+from core.cache.memcached import MemcachedCache
+from core.management.commands.serve_benchmark import _free_port
+from core.cache.sqlite import SQLiteCache
+from core.cache.standin import MemcachedStandIn
+from core.db.routers import ReplicaRouter, allow_replicas, pin_to_primary
+from core.middleware import PIN_COOKIE, PrimaryPinningMiddleware
+from core.testing import QueryPlanMixin
+from posts.models import Comment, Follow, Post, User
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +42,517 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(
+    INSTRUMENTATION_SAMPLE_RATE=1, QUERY_BUDGETS={'posts:index': 1})
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_and_budget(self):
+        """Замеры уходят в Server-Timing и сводку; превышение бюджета
+        попадает в лог."""
+        with self.assertLogs('core.instrumentation', 'WARNING') as logs:
+            response = self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ queries')
+        self.assertIn('tpl;dur=', timing)
+        response = self.client.get(reverse('posts:group_list', args=['no']))
+        self.assertIn('Server-Timing', response)
+        stats = instrumentation.stats()
+        self.assertEqual(stats['posts:index']['requests'], 1)
+        self.assertEqual(stats['posts:index']['over_budget'], 1)
+        self.assertEqual(stats['posts:group_list']['requests'], 1)
+        output = StringIO()
+        call_command('instrumentation_stats', stdout=output)
+        self.assertIn('posts:group_list', output.getvalue())
+
+    def test_profile_counts_duplicates_and_cache(self):
+        with instrumentation.profiling() as profile:
+            for _ in range(2):
+                list(Post.objects.filter(author=self.user))
+            cache.set('key', 1)
+            cache.get('key')
+            cache.get_many(['key', 'missing'])
+            instrumentation.record('thumbnails')
+        self.assertEqual(profile.queries, 2)
+        self.assertEqual(profile.duplicates, 1)
+        self.assertEqual(profile.cache_hits, 2)
+        self.assertEqual(profile.cache_misses, 1)
+        self.assertIn('thumbnails;desc="1"', profile.server_timing())
+        list(Post.objects.all())
+        self.assertEqual(profile.queries, 2)
+
+
+class RouteBenchmarkTests(TestCase):
+    def test_every_route_measured_and_compared(self):
+        """seed_benchmark заполняет базу, route_benchmark замеряет
+        адреса posts и about, кроме меняющих данные, а --compare ловит
+        регрессию."""
+        call_command(
+            'seed_benchmark', users=30, posts=60, groups=2, follows=3,
+            stdout=StringIO())
+        self.assertGreater(Comment.objects.count(), 0)
+        follows = set(Follow.objects.values_list('user_id', 'author_id'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('route_benchmark', requests=2, output=path)
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            routes = {
+                (result['route'], result['role'])
+                for result in report['results']
+            }
+            self.assertIn(('posts:post_detail', 'anonymous'), routes)
+            self.assertIn(('posts:follow_index', 'user'), routes)
+            self.assertIn(('about:tech', 'user'), routes)
+            self.assertNotIn(('posts:profile_follow', 'user'), routes)
+            self.assertNotIn(('posts:export_data', 'user'), routes)
+            self.assertEqual(
+                set(Follow.objects.values_list('user_id', 'author_id')),
+                follows)
+            self.assertTrue(all(
+                result['status'] < 500 for result in report['results']))
+            self.assertEqual(report['data']['posts'], 60)
+            for result in report['results']:
+                result['queries_max'] = -1
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'route_benchmark', requests=1, compare=path,
+                    stdout=StringIO(), stderr=StringIO())
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    """Профиль sqlite-wal на настоящем файле базы."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.name = os.path.join(self.directory, 'db.sqlite3')
+        self.connections = ConnectionHandler({'default': {
+            **settings.DATABASE_PROFILES['sqlite-wal'], 'NAME': self.name}})
+        self.connection = self.connections['default']
+
+    def tearDown(self):
+        self.connections.close_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertLess(self.pragma('cache_size'), 0)
+        self.assertGreater(self.pragma('busy_timeout'), 0)
+
+    def test_atomic_takes_write_lock_at_begin(self):
+        """Транзакция сразу берёт блокировку записи, а читать базу
+        другим соединениям при этом можно."""
+        self.pragma('journal_mode')
+        self.connection.set_autocommit(True)
+        self.connection._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.name, timeout=0)
+        try:
+            other.execute('SELECT 1 FROM sqlite_master').fetchall()
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute('CREATE TABLE t (id INTEGER)')
+        finally:
+            other.close()
+            self.connection.cursor().execute('ROLLBACK')
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            'db_benchmark', '--seconds=0.2', '--readers=1', '--writers=1',
+            stdout=out)
+        self.assertIn('sqlite-wal', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    """Чтения — с реплик, записи и всё после них — с основной базы."""
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        pin_to_primary()
+
+    def request(self, request, write=False):
+        """Прогоняет запрос через middleware и возвращает ответ и базу,
+        выбранную для чтения внутри вьюхи."""
+        seen = {}
+
+        def view(request):
+            if write:
+                self.router.db_for_write(None)
+            seen['db'] = self.router.db_for_read(None)
+            return HttpResponse()
+        response = PrimaryPinningMiddleware(view)(request)
+        return response, seen['db']
+
+    def test_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        allow_replicas()
+        self.assertEqual(self.router.db_for_read(None), 'replica1')
+
+    def test_reads_go_to_replica_and_writes_pin(self):
+        response, db = self.request(self.factory.get('/'))
+        self.assertEqual(db, 'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response, db = self.request(self.factory.get('/'), write=True)
+        self.assertEqual(db, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 15)
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_cookie_and_unsafe_methods_read_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        response, db = self.request(request)
+        self.assertEqual(db, 'default')
+        # Чтение по куке не продлевает её.
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        _, db = self.request(self.factory.post('/'))
+        self.assertEqual(db, 'default')
+
+    def test_comment_sets_pin_cookie(self):
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            {'text': 'Комментарий'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+class FastChangeListTests(QueryPlanMixin, TestCase):
+    """Тестируем список постов в админке на оценках и индексах."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        dates = [
+            datetime.datetime(2023, 12, 31, 23, 30),
+            datetime.datetime(2024, 1, 5),
+            datetime.datetime(2024, 1, 5, 18),
+            datetime.datetime(2024, 1, 20),
+            datetime.datetime(2024, 3, 1),
+        ]
+        for number, date in enumerate(dates):
+            post = Post.objects.create(author=cls.admin, text=f'Пост {number}')
+            Post.objects.filter(id=post.id).update(
+                pub_date=timezone.make_aware(date))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, threshold, **params):
+        constants = {
+            **settings.CONSTANTS, 'ADMIN_COUNT_ESTIMATE_FROM': threshold}
+        with override_settings(CONSTANTS=constants):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    reverse('admin:posts_post_changelist'), params)
+        post_queries = [
+            query for query in queries.captured_queries
+            if 'posts_post' in query['sql']
+        ]
+        return response.context['cl'], post_queries
+
+    def test_estimate_replaces_count(self):
+        """Выше порога COUNT(*) не выполняется вовсе."""
+        cl, queries = self.changelist(threshold=1)
+        self.assertTrue(cl.paginator.estimated)
+        self.assertEqual(cl.result_count, Post.objects.latest('id').id)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+    def test_exact_count_below_threshold(self):
+        """Ниже порога — один точный COUNT, общий не считается."""
+        cl, queries = self.changelist(threshold=1000)
+        self.assertFalse(cl.paginator.estimated)
+        self.assertEqual(cl.result_count, 5)
+        self.assertEqual(
+            sum('COUNT(' in query['sql'] for query in queries), 1)
+
+    def test_date_hierarchy_matches_dates(self):
+        """Дерево дат то же, что у dates(), и строится по индексу."""
+        for kind, params in (
+            ('year', {}),
+            ('month', {'pub_date__year': 2024}),
+            ('day', {'pub_date__year': 2024, 'pub_date__month': 1}),
+        ):
+            with self.subTest(kind=kind):
+                queryset = Post.objects.filter(**params)
+                self.assertEqual(
+                    IndexedDatesQuerySet(Post).filter(**params).dates(
+                        'pub_date', kind),
+                    list(queryset.dates('pub_date', kind)))
+                cl, queries = self.changelist(1000, **params)
+                self.assertIndexedQueries(queries)
+
+    def test_min_max_by_index(self):
+        posts = IndexedDatesQuerySet(Post)
+        self.assertEqual(
+            posts.aggregate(
+                first=Min('pub_date'), last=Max('pub_date'), n=Count('id')),
+            Post.objects.aggregate(
+                first=Min('pub_date'), last=Max('pub_date'), n=Count('id')))
+        self.assertEqual(
+            posts.aggregate(first=Min('pub_date'), last=Max('pub_date')),
+            Post.objects.aggregate(
+                first=Min('pub_date'), last=Max('pub_date')))
+
+
+def asgi_get(application, path, receive=None):
+    """Один GET через ASGI-приложение; возвращает статус и тело."""
+    sent = []
+
+    async def default_receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    async def call():
+        await application({
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': b'',
+            'headers': [(b'host', b'localhost')],
+        }, receive or default_receive, send)
+    return call(), sent
+
+
+def response_of(sent):
+    return sent[0]['status'], b''.join(
+        message.get('body', b'') for message in sent[1:])
+
+
+class ASGITests(SimpleTestCase):
+    """Тестируем ASGI-обёртку с пулом потоков."""
+    def test_django_page(self):
+        call, sent = asgi_get(get_asgi_application(2), '/about/author/')
+        asyncio.run(call)
+        status, body = response_of(sent)
+        self.assertEqual(status, 200)
+        self.assertIn('Об авторе'.encode(), body)
+
+    def test_pool_is_bounded(self):
+        """Одновременно в Django не больше threads запросов."""
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def app(environ, start_response):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+        handler = ASGIHandler(app, threads=2)
+
+        async def main():
+            calls = [asgi_get(handler, '/') for _ in range(6)]
+            await asyncio.gather(*(call for call, _ in calls))
+            return [sent for _, sent in calls]
+        for sent in asyncio.run(main()):
+            self.assertEqual(response_of(sent), (200, b'ok'))
+        self.assertEqual(max(peak), 2)
+
+    def test_slow_client_does_not_hold_thread(self):
+        """Пока медленный клиент шлёт тело, единственный поток свободен."""
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return [environ['wsgi.input'].read() or b'fast']
+        handler = ASGIHandler(app, threads=1)
+
+        async def main():
+            body_sent = asyncio.Event()
+
+            async def slow_receive():
+                await body_sent.wait()
+                return {'type': 'http.request', 'body': b'slow'}
+            slow, slow_sent = asgi_get(handler, '/', slow_receive)
+            fast, fast_sent = asgi_get(handler, '/')
+            slow_task = asyncio.ensure_future(slow)
+            await fast
+            self.assertEqual(response_of(fast_sent), (200, b'fast'))
+            self.assertEqual(slow_sent, [])
+            body_sent.set()
+            await slow_task
+            self.assertEqual(response_of(slow_sent), (200, b'slow'))
+        asyncio.run(main())
+
+    def test_streaming_in_one_thread(self):
+        """Потоковый ответ читается в одном потоке, частями."""
+        threads = set()
+
+        class Streaming:
+            streaming = True
+
+            def __iter__(self):
+                for chunk in (b'a', b'b', b'c'):
+                    threads.add(threading.get_ident())
+                    yield chunk
+
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return Streaming()
+        call, sent = asgi_get(ASGIHandler(app, threads=4), '/')
+        asyncio.run(call)
+        self.assertEqual(response_of(sent), (200, b'abc'))
+        self.assertEqual(len(sent), 5)
+        self.assertEqual(len(threads), 1)
+
+    def test_http_server(self):
+        """Встроенный сервер отвечает по HTTP/1.1."""
+        ready = threading.Event()
+        port = _free_port()
+        threading.Thread(
+            target=serve,
+            args=(get_asgi_application(2), '127.0.0.1', port, ready.set),
+            daemon=True,
+        ).start()
+        self.assertTrue(ready.wait(5))
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        connection.request('GET', '/about/tech/?x=1')
+        response = connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertIn('Технологии'.encode(), response.read())
+        connection.close()
+
+
+class SharedCacheContract:
+    """Общие проверки бэкендов, которые видят все воркеры."""
+    def make_cache(self):
+        raise NotImplementedError
+
+    def test_two_workers_share_values(self):
+        """Значение, записанное одним воркером, видно другому."""
+        worker_1, worker_2 = self.make_cache(), self.make_cache()
+        worker_1.set('page', {'html': 'Пост'}, 60)
+        self.assertEqual(worker_2.get('page'), {'html': 'Пост'})
+        worker_2.delete('page')
+        self.assertIsNone(worker_1.get('page'))
+
+    def test_add_is_single_flight_lock(self):
+        """add удаётся только первому воркеру."""
+        worker_1, worker_2 = self.make_cache(), self.make_cache()
+        self.assertTrue(worker_1.add('lock', 1, 60))
+        self.assertFalse(worker_2.add('lock', 1, 60))
+
+    def test_incr_and_many(self):
+        """incr работает для версий тегов, get_many — для пачки ключей."""
+        cache = self.make_cache()
+        cache.set('tag-version:posts', 41, None)
+        self.assertEqual(cache.incr('tag-version:posts'), 42)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        self.assertEqual(
+            cache.get_many(['tag-version:posts', 'missing']),
+            {'tag-version:posts': 42}
+        )
+
+
+class SQLiteCacheTests(SharedCacheContract, SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            self.location, {'KEY_PREFIX': 'yatube', 'OPTIONS': options})
+
+    def test_cull(self):
+        """Сверх MAX_ENTRIES удаляется доля записей, при CULL_FREQUENCY
+        = 0 — все."""
+        for frequency, left in ((2, 25), (0, 0)):
+            with self.subTest(frequency=frequency):
+                cache = self.make_cache(
+                    MAX_ENTRIES=10, CULL_FREQUENCY=frequency)
+                cache.clear()
+                cache.set_many({f'key-{i}': i for i in range(50)}, 60)
+                cache._cull()
+                stored = cache._connection.execute(
+                    'SELECT COUNT(*) FROM cache').fetchone()[0]
+                self.assertEqual(stored, left)
+
+
+class MemcachedCacheTests(SharedCacheContract, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MemcachedStandIn().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.storage.items.clear()
+
+    def make_cache(self):
+        return MemcachedCache(self.server.location, {'KEY_PREFIX': 'yatube'})
+
+    def test_unsafe_keys_hashed(self):
+        """Ключи с пробелами и длиннее 250 байт не ломают протокол."""
+        cache = self.make_cache()
+        keys = ('author:имя с пробелом', 'page:' + 'x' * 300)
+        for number, key in enumerate(keys):
+            cache.set(key, number, 60)
+        self.assertEqual(cache.get_many(keys), dict(zip(keys, range(2))))
+        for key in self.server.storage.items:
+            self.assertLessEqual(len(key.encode()), 250)
+            self.assertNotIn(' ', key)
+
+    def test_protocol_errors_are_misses(self):
+        """Непонятный ответ или значение — промах, а соединение
+        пересоздаётся и дальше работает."""
+        cache = self.make_cache()
+        cache.set('good', 'значение', 60)
+        self.server.storage.items[cache.make_key('broken')] = (
+            1, b'not a pickle', None)
+        self.assertIsNone(cache.get('broken'))
+        self.assertEqual(cache._cache._command('bogus'), b'')
+        self.assertEqual(cache.get('good'), 'значение')
+
+    def test_several_servers_rejected(self):
+        """Раскладки по серверам нет — список серверов не принимается."""
+        cache = MemcachedCache(
+            f'{self.server.location};127.0.0.1:1', {'KEY_PREFIX': 'yatube'})
+        with self.assertRaises(ImproperlyConfigured):
+            cache.get('key')
+
+    def test_pages_cached_through_memcached(self):
+        """Страница ленты кэшируется в memcached и отдаётся из него."""
+        caches = {'default': {
+            'BACKEND': 'core.cache.memcached.MemcachedCache',
+            'LOCATION': self.server.location,
+            'KEY_PREFIX': 'yatube',
+        }}
+        with override_settings(CACHES=caches):
+            self.assertEqual(self.client.get('/')['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/')['X-Cache'], 'HIT')
+        self.assertTrue(any(
+            b'cache_page' in key.encode()
+            for key in self.server.storage.items
+        ))
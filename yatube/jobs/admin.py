@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from core.admin import FastChangeListMixin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'finished',
+    )
+    list_filter = ('status',)
+    search_fields = ('name', 'key')
+    readonly_fields = ('locked_by', 'locked_until', 'created', 'finished')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, run_at=timezone.now(),
+            finished=None, locked_until=None)
+        self.message_user(request, f'Снова в очереди: {updated}')
+    retry.short_description = 'Повторить выбранные задачи'
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = ('Удаляет выполненные задачи старше --days дней; их ключи '
+            'идемпотентности снова можно использовать.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+
+    def handle(self, *args, **options):
+        deleted = queue.purge(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено задач: {deleted}'))
@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = ('Воркер очереди фоновых задач. Нужен, когда JOBS_EAGER=0: '
+            'тогда вьюхи только записывают задачи в базу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Число процессов-воркеров.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.')
+        parser.add_argument('--batch', type=int, default=queue.BATCH_SIZE)
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            self.work(options)
+            return
+        # Соединения с базой не должны достаться дочерним процессам.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=self.work, args=(options,))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+
+        def terminate(signum, frame):
+            for process in processes:
+                process.terminate()
+        signal.signal(signal.SIGTERM, terminate)
+        for process in processes:
+            process.join()
+
+    def work(self, options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+        # Текущая задача доделывается, новые не берутся.
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: stop.set())
+        self.stdout.write(f'Воркер {worker} запущен')
+        done = queue.work(
+            worker, once=options['once'], limit=options['batch'],
+            poll=options['poll'], stop=stop)
+        self.stdout.write(f'Воркер {worker}: выполнено задач {done}')
@@ -0,0 +1,209 @@
+"""Очередь фоновых задач в базе.
+
+enqueue пишет задачу строкой Job в текущей транзакции — это outbox:
+задача появляется ровно тогда, когда коммитится то, что её породило,
+и исчезает вместе с откатом. Ответ уходит сразу после коммита, а
+задачу выполняет воркер (команда run_jobs).
+
+Воркер забирает задачу условным UPDATE: из нескольких воркеров его
+выполнит только один, без SELECT ... FOR UPDATE, поэтому очередь
+работает и на SQLite. Короткие задачи, которые только пишут в базу
+(task(atomic=True)), выполняются в одной транзакции с отметкой о
+выполнении: их изменения применяются ровно один раз. Остальные —
+письма, файлы, долгие вставки пачками — выполняются вне транзакции,
+чтобы не держать блокировку записи SQLite (BEGIN IMMEDIATE) всё это
+время, и отмечаются отдельным коротким UPDATE. Они выполняются «хотя
+бы раз» и должны выдерживать повтор: если воркер упал, задачу после
+истечения аренды возьмёт другой. Ошибка откладывает
+задачу с экспоненциальной задержкой, после max_attempts она остаётся
+в состоянии failed. Ключ идемпотентности не даёт поставить одну и ту
+же задачу дважды, пока строка не удалена purge_jobs.
+
+При CONSTANTS['JOBS_EAGER'] задачи выполняются без воркера, сразу
+после коммита транзакции, которая их поставила: для разработки и для
+тестов. Откат отменяет задачу, как и в очереди.
+"""
+import datetime
+import json
+import logging
+import random
+import threading
+import traceback
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач воркер забирает за раз и на сколько секунд: если он не
+# успел (упал), задачу возьмёт другой.
+BATCH_SIZE = 10
+LEASE = 300
+# Задержка перед повтором: RETRY_DELAY * 2 ** (попытка - 1), не больше
+# RETRY_DELAY_MAX, плюс случайная добавка против одновременных повторов.
+RETRY_DELAY = 10
+RETRY_DELAY_MAX = 3600
+ERROR_LENGTH = 4000
+
+_registry = {}
+
+
+class LeaseLost(Exception):
+    """Аренда задачи истекла, и её забрал другой воркер."""
+
+
+def task(name=None, max_attempts=5, atomic=False):
+    """Регистрирует функцию как задачу; аргументы — только именованные
+    и сериализуемые в JSON. atomic — выполнять в транзакции отметки о
+    выполнении (только для коротких задач без внешних действий)."""
+    def decorator(function):
+        function.task_name = (
+            name or f'{function.__module__}.{function.__name__}')
+        function.max_attempts = max_attempts
+        function.atomic = atomic
+        _registry[function.task_name] = function
+        return function
+    return decorator
+
+
+def eager():
+    return bool(settings.CONSTANTS['JOBS_EAGER'])
+
+
+def enqueue(function, key=None, delay=0, **payload):
+    """Ставит задачу в очередь в текущей транзакции.
+
+    Задача с уже известным ключом не ставится повторно.
+    """
+    if eager():
+        # Не внутри транзакции вьюхи: письмо не уйдёт при откате, а
+        # ошибка задачи не откатит пост.
+        transaction.on_commit(lambda: _run_eager(function, payload))
+        return
+    Job.objects.bulk_create([Job(
+        name=function.task_name,
+        payload=json.dumps(payload, cls=DjangoJSONEncoder),
+        key=key,
+        max_attempts=function.max_attempts,
+        run_at=timezone.now() + datetime.timedelta(seconds=delay),
+    )], ignore_conflicts=key is not None)
+
+
+def _run_eager(function, payload):
+    # Пост уже закоммичен: ошибка задачи не должна превращать ответ
+    # в 500.
+    try:
+        function(**payload)
+    except Exception:
+        logger.exception('Задача %s не выполнена', function.task_name)
+
+
+def claim(worker, limit=BATCH_SIZE, lease=LEASE):
+    """Забирает до limit готовых задач и задач с истекшей арендой."""
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        Q(status=Job.PENDING, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by('run_at').values_list('id', 'status', 'locked_until')
+    claimed = []
+    for job_id, status, locked_until in candidates[:limit]:
+        # Условие на прежнее состояние: если задачу уже забрал другой
+        # воркер, UPDATE ничего не изменит.
+        updated = Job.objects.filter(
+            pk=job_id, status=status, locked_until=locked_until,
+        ).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_until=now + datetime.timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def _retry_delay(attempts):
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), RETRY_DELAY_MAX)
+    return datetime.timedelta(seconds=delay * random.uniform(1, 1.5))
+
+
+def _finish(job, mine):
+    if not mine.filter(status=Job.RUNNING).update(
+            status=Job.DONE, finished=timezone.now(),
+            locked_until=None, last_error=''):
+        raise LeaseLost(job.pk)
+
+
+def run(job):
+    """Выполняет забранную задачу; True, если она выполнена."""
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    if job.attempts > job.max_attempts:
+        # Попытки кончились на падениях воркеров, а не на ошибках задачи.
+        mine.update(
+            status=Job.FAILED, finished=timezone.now(), locked_until=None,
+            last_error=job.last_error or 'Воркер не завершил задачу')
+        return False
+    try:
+        function = _registry.get(job.name)
+        if function is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована')
+        payload = json.loads(job.payload)
+        if function.atomic:
+            with transaction.atomic():
+                function(**payload)
+                _finish(job, mine)
+        else:
+            function(**payload)
+            _finish(job, mine)
+    except LeaseLost:
+        logger.warning('Задачу %s забрал другой воркер', job)
+        return False
+    except Exception:
+        error = traceback.format_exc()[-ERROR_LENGTH:]
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            logger.exception('Задача %s не выполнена', job)
+            mine.update(
+                status=Job.FAILED, finished=now, locked_until=None,
+                last_error=error)
+        else:
+            logger.warning('Задача %s: ошибка, повтор позже', job,
+                           exc_info=True)
+            mine.update(
+                status=Job.PENDING, run_at=now + _retry_delay(job.attempts),
+                locked_until=None, last_error=error)
+        return False
+    return True
+
+
+def work(worker, once=False, limit=BATCH_SIZE, poll=1.0, stop=None):
+    """Цикл воркера; с once — до опустошения очереди. Возвращает число
+    выполненных задач."""
+    stop = stop or threading.Event()
+    done = 0
+    while not stop.is_set():
+        jobs = claim(worker, limit)
+        for job in jobs:
+            done += run(job)
+        # Соединение могло истечь (CONN_MAX_AGE) или оборваться.
+        close_old_connections()
+        if not jobs:
+            if once:
+                break
+            stop.wait(poll)
+    return done
+
+
+def purge(days):
+    """Удаляет выполненные задачи старше days дней; их ключи
+    освобождаются. Возвращает число удалённых."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - datetime.timedelta(days=days),
+    ).delete()
+    return deleted
@@ -0,0 +1,181 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import run_on_commit
+from posts.models import Comment, FeedItem, Post, User
+from posts.search import search
+from . import queue
+from .models import Job
+
+CALLS = []
+
+
+@queue.task(name='jobs.tests.flaky', max_attempts=2)
+def flaky(fail):
+    CALLS.append(fail)
+    if fail:
+        raise ValueError('сбой')
+
+
+@queue.task(name='jobs.tests.outside')
+def outside():
+    CALLS.append(connection.in_atomic_block)
+
+
+@queue.task(name='jobs.tests.inside', atomic=True)
+def inside():
+    CALLS.append(connection.in_atomic_block)
+
+
+@override_settings(CONSTANTS={**settings.CONSTANTS, 'JOBS_EAGER': 0})
+class QueueTests(TestCase):
+    """Тестируем очередь фоновых задач."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_views_write_outbox(self):
+        """Вьюхи только пишут задачи; лента, поиск и письмо появляются
+        после работы воркера."""
+        self.client.force_login(self.reader)
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        self.client.force_login(self.author)
+        self.client.post(reverse('posts:post_create'), {'text': 'Слоны'})
+        post = Post.objects.get()
+        self.client.force_login(self.reader)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            {'text': 'Хорошо'})
+        self.assertFalse(FeedItem.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            set(Job.objects.values_list('name', flat=True)), {
+                'posts.tasks.sync_inbox', 'posts.tasks.fan_out_post',
+                'posts.tasks.index_post', 'posts.tasks.notify_comment',
+            })
+        self.assertEqual(queue.work('test', once=True), Job.objects.count())
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(search('слоны')[:10]), [post])
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+
+    def test_edit_and_job_commit_together(self):
+        """Правка поста и её задача пишутся в одной транзакции: без
+        задачи не сохраняется и пост."""
+        post = Post.objects.create(author=self.author, text='Слоны')
+        self.client.force_login(self.author)
+        with mock.patch.object(
+                Job.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(
+                    reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                    {'text': 'Жирафы'})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Слоны')
+
+    def test_rollback_drops_job(self):
+        """Задача откатывается вместе с транзакцией, которая её создала."""
+        with self.assertRaises(ValueError), transaction.atomic():
+            queue.enqueue(flaky, fail=False)
+            raise ValueError
+        self.assertFalse(Job.objects.exists())
+
+    def test_idempotency_key(self):
+        """Задача с тем же ключом ставится один раз."""
+        queue.enqueue(flaky, key='once', fail=False)
+        queue.enqueue(flaky, key='once', fail=False)
+        queue.work('test', once=True)
+        self.assertEqual(CALLS, [False])
+
+    def test_retry_then_fail(self):
+        """Ошибка откладывает задачу, после max_attempts она failed."""
+        queue.enqueue(flaky, fail=True)
+        queue.work('test', once=True)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('сбой', job.last_error)
+        Job.objects.update(run_at=timezone.now())
+        queue.work('test', once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(CALLS, [True, True])
+
+    def test_expired_lease(self):
+        """Задачу упавшего воркера забирает другой; опоздавший воркер
+        её не завершает."""
+        queue.enqueue(flaky, fail=False)
+        [stale] = queue.claim('first', lease=-1)
+        [job] = queue.claim('second')
+        self.assertFalse(queue.run(stale))
+        self.assertTrue(queue.run(job))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.locked_by), (Job.DONE, 'second'))
+
+
+@override_settings(CONSTANTS={**settings.CONSTANTS, 'JOBS_EAGER': 0})
+class QueueTransactionTests(TransactionTestCase):
+    """Тестируем, в транзакции ли выполняются задачи: в TestCase
+    транзакция открыта всегда."""
+    def setUp(self):
+        CALLS.clear()
+
+    def test_only_atomic_tasks_hold_transaction(self):
+        """Обычная задача выполняется вне транзакции и не держит
+        блокировку записи, atomic — вместе с отметкой о выполнении."""
+        queue.enqueue(outside)
+        queue.work('test', once=True)
+        queue.enqueue(inside)
+        queue.work('test', once=True)
+        self.assertEqual(CALLS, [False, True])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+
+@override_settings(CONSTANTS={**settings.CONSTANTS, 'JOBS_EAGER': 1})
+class EagerTests(TestCase):
+    """Тестируем выполнение задач без воркера."""
+    def setUp(self):
+        CALLS.clear()
+
+    def test_runs_after_commit(self):
+        """Задача выполняется после коммита, а не внутри транзакции."""
+        with run_on_commit():
+            with transaction.atomic():
+                queue.enqueue(flaky, fail=False)
+                self.assertEqual(CALLS, [])
+        self.assertEqual(CALLS, [False])
+        self.assertFalse(Job.objects.exists())
+
+    def test_rollback_cancels_mail(self):
+        """Откат отменяет письмо о комментарии."""
+        author = User.objects.create_user(
+            username='author', email='author@example.com')
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=author, text='Пост')
+        with run_on_commit():
+            with self.assertRaises(ValueError), transaction.atomic():
+                Comment.objects.create(post=post, author=reader, text='Да')
+                raise ValueError
+        self.assertEqual(len(mail.outbox), 0)
+        with run_on_commit():
+            Comment.objects.create(post=post, author=reader, text='Да')
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+
+    def test_error_is_logged(self):
+        """Ошибка задачи пишется в лог и не доходит до вызывающего."""
+        with self.assertLogs('jobs.queue', 'ERROR'), run_on_commit():
+            queue.enqueue(flaky, fail=True)
+        self.assertEqual(CALLS, [True])
@@ -1,9 +1,28 @@
+from django import forms
 from django.contrib import admin
-from .models import Post, Group, Comment, Follow
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from core.admin import FastChangeListMixin
+from . import moderation
+from .models import Post, Group, Comment, Follow, User
+from .search import matching_post_ids
+
+CONFIRMATION_TEMPLATE = 'admin/posts/post/bulk_action_confirmation.html'
+# Сколько авторов перечислять на странице подтверждения.
+AUTHORS_SHOWN = 20
+
+
+class PostActionForm(helpers.ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='без группы'
+    )
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,9 +31,103 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = (
+        'move_to_group',
+        'purge_comments',
+        'delete_posts',
+        'delete_authors_spam',
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по полнотекстовому индексу, а не LIKE по всей таблице.
+        if not search_term:
+            return queryset, False
+        return queryset.filter(id__in=matching_post_ids(search_term)), False
+
+    def get_actions(self, request):
+        # Стандартное удаление грузит каждый пост и его комментарии;
+        # вместо него — delete_posts.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def confirm(self, request, title, summary):
+        """Страница подтверждения; None, если действие уже подтверждено."""
+        if request.POST.get('post') == 'yes':
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': title,
+            'summary': summary,
+            'action': request.POST['action'],
+            'select_across': request.POST.get('select_across', '0'),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, CONFIRMATION_TEMPLATE, context)
+
+    def move_to_group(self, request, queryset):
+        # response_action уже проверил форму действия целиком.
+        group = PostActionForm.base_fields['group'].clean(
+            request.POST.get('group'))
+        moved = moderation.reassign_group(queryset, group)
+        self.message_user(
+            request, f'Перенесено постов: {moved} в «{group or "без группы"}»')
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def purge_comments(self, request, queryset):
+        response = self.confirm(
+            request, 'Удалить комментарии',
+            [f'Будут удалены все комментарии к постам: '
+             f'{queryset.count()}'])
+        if response:
+            return response
+        deleted = moderation.purge_comments(queryset)
+        self.message_user(request, f'Удалено комментариев: {deleted}')
+    purge_comments.short_description = 'Удалить комментарии к постам'
+    purge_comments.allowed_permissions = ('delete',)
+
+    def delete_posts(self, request, queryset):
+        response = self.confirm(
+            request, 'Удалить посты',
+            [f'Будут удалены посты: {queryset.count()}, вместе с '
+             f'комментариями к ним'])
+        if response:
+            return response
+        deleted = moderation.delete_posts(queryset)
+        self.message_user(request, f'Удалено постов: {deleted}')
+    delete_posts.short_description = 'Удалить выбранные посты'
+    delete_posts.allowed_permissions = ('delete',)
+
+    def delete_authors_spam(self, request, queryset):
+        author_ids = list(queryset.order_by().values_list(
+            'author', flat=True).distinct())
+        shown = User.objects.filter(
+            id__in=author_ids[:AUTHORS_SHOWN]
+        ).values_list('username', 'counters__posts_count')
+        summary = ['Будут удалены все посты и комментарии авторов:'] + [
+            f'{username} (постов: {posts_count})'
+            for username, posts_count in shown
+        ]
+        if len(author_ids) > AUTHORS_SHOWN:
+            summary.append(f'и ещё {len(author_ids) - AUTHORS_SHOWN}')
+        response = self.confirm(request, 'Удалить спам авторов', summary)
+        if response:
+            return response
+        posts, comments = moderation.delete_authors_content(author_ids)
+        self.message_user(
+            request, f'Удалено постов: {posts}, комментариев: {comments}')
+    delete_authors_spam.short_description = (
+        'Удалить все посты и комментарии авторов')
+    delete_authors_spam.allowed_permissions = ('delete',)
 
 
 admin.site.register(Group)
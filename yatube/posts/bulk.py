@@ -0,0 +1,93 @@
+"""Массовая загрузка: чтение CSV/JSONL потоком, пачки, обход выборки
+по id, даты из данных и отключение вторичных индексов на время
+загрузки."""
+import csv
+import json
+import os
+from contextlib import contextmanager
+
+from django.db import connection
+
+BATCH_SIZE = 5000
+
+
+def read_rows(path):
+    """Строки файла как словари, по одной: память не растёт с размером.
+
+    Формат — по расширению: .csv с заголовком или .jsonl/.ndjson.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as file:
+        if extension == '.csv':
+            yield from csv.DictReader(file)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f'Неизвестный формат файла: {path}')
+
+
+def batches(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def id_chunks(queryset, size=BATCH_SIZE):
+    """Списки id выборки по возрастанию, не больше size в каждом.
+
+    Каждая пачка — отдельный короткий запрос (keyset по id): курсор
+    не остаётся открытым, пока пачку обрабатывают.
+    """
+    ids = queryset.order_by('id').values_list('id', flat=True)
+    last = 0
+    while True:
+        chunk = list(ids.filter(id__gt=last)[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты из объектов."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def indexes_dropped(*models):
+    """Удаляет индексы из Meta.indexes на время загрузки и строит заново.
+
+    Построить индекс по готовой таблице быстрее, чем обновлять его на
+    каждой вставке. Первичные ключи и уникальные ограничения остаются:
+    на них держатся связи и ignore_conflicts. Внутри транзакции схему
+    менять нельзя (SQLite) или опасно, поэтому там индексы не трогаются.
+    Возвращает, были ли индексы удалены.
+    """
+    if connection.in_atomic_block:
+        yield False
+        return
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        yield True
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
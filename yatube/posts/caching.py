@@ -0,0 +1,403 @@
+import datetime
+import logging
+import math
+import random
+import threading
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_cache_key, learn_cache_key, patch_cache_control
+)
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+TAG_PREFIX = 'tag-version:'
+POST_PAGE_PREFIX = 'post-page:'
+POSTS_TAG = 'posts'
+STATS_PREFIX = 'page-cache-stats:'
+OUTCOMES = ('hit', 'miss', 'stale')
+STAMPEDE_LOCK_TIMEOUT = 30
+STAMPEDE_WAIT = 2.0
+STAMPEDE_POLL = 0.05
+EARLY_EXPIRATION_BETA = 1.0
+
+
+def group_tag(slug):
+    return f'group:{slug}'
+
+
+def author_tag(username):
+    return f'author:{username}'
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def _new_version():
+    # Версия от времени, а не с единицы: если ключ вытеснили из кэша,
+    # новая версия не совпадёт ни с одной из старых.
+    return int(time.time() * 1000)
+
+
+def tag_versions(tags):
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def versioned_key(name, tags):
+    """Ключ, который меняется при инвалидации любого из тегов."""
+    versions = '.'.join(str(version) for version in tag_versions(tags))
+    return f'{name}:{versions}'
+
+
+def _request_versions(request, tags, args, kwargs):
+    """Версии тегов страницы — один раз за запрос: их читают и
+    condition_tagged, и кэш страницы."""
+    memo = request.__dict__.setdefault('_tag_versions', {})
+    if tags not in memo:
+        memo[tags] = tag_versions(
+            [tag for tag in tags(request, *args, **kwargs) if tag])
+    return memo[tags]
+
+
+def _bump(tags):
+    now = _new_version()
+    current = cache.get_many([TAG_PREFIX + tag for tag in tags])
+    for tag in tags:
+        key = TAG_PREFIX + tag
+        # incr атомарен: параллельные сбросы не потеряются, версия
+        # растёт минимум на 1 и не отстаёт от текущего времени.
+        try:
+            cache.incr(key, max(1, now - current.get(key, now)))
+        except ValueError:
+            cache.set(key, now, None)
+
+
+# Отложенные сбросы: тег -> когда его сбросить (time.monotonic).
+# Их выполняет один поток на процесс, а не таймер на каждый сброс.
+_delayed = {}
+_delayed_changed = threading.Condition()
+_delayed_thread = None
+
+
+def _bump_later(tags):
+    """Сбрасывает теги через DATABASE_REPLICA_LAG секунд.
+
+    Повторный сброс того же тега до срока не добавляет работы, а
+    переносит срок: достаточно одного сброса после последней записи.
+    """
+    global _delayed_thread
+    due = time.monotonic() + settings.DATABASE_REPLICA_LAG
+    with _delayed_changed:
+        for tag in tags:
+            _delayed[tag] = max(due, _delayed.get(tag, due))
+        # После fork потока в процессе нет — запускаем заново.
+        if _delayed_thread is None or not _delayed_thread.is_alive():
+            _delayed_thread = threading.Thread(
+                target=_run_delayed, name='cache-delayed-bumps', daemon=True)
+            _delayed_thread.start()
+        _delayed_changed.notify()
+
+
+def _take_due_tags():
+    """Ждёт, пока у какого-нибудь тега наступит срок, и забирает их."""
+    with _delayed_changed:
+        while True:
+            now = time.monotonic()
+            tags = [tag for tag, due in _delayed.items() if due <= now]
+            if tags:
+                for tag in tags:
+                    del _delayed[tag]
+                return tags
+            timeout = min(_delayed.values()) - now if _delayed else None
+            _delayed_changed.wait(timeout)
+
+
+def _run_delayed():
+    while True:
+        tags = _take_due_tags()
+        try:
+            _bump(tags)
+        except Exception:
+            logger.exception('Не удалось сбросить теги %s', tags)
+
+
+def invalidate(*tags):
+    """Сбрасывает всё, что закэшировано под тегами.
+
+    Второй сброс после коммита вытесняет страницы, которые параллельные
+    запросы успели собрать из ещё не закоммиченных данных. С репликами
+    нужен и третий, когда изменение гарантированно до них дошло: иначе
+    в кэше надолго останется страница, собранная с отстающей реплики.
+    """
+    tags = [tag for tag in tags if tag]
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+    if settings.DATABASE_REPLICAS:
+        transaction.on_commit(lambda: _bump_later(tags))
+
+
+def _count(outcome):
+    key = STATS_PREFIX + outcome
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def page_cache_stats():
+    """Счётчики попаданий, промахов и отдачи устаревших страниц."""
+    values = cache.get_many([STATS_PREFIX + outcome for outcome in OUTCOMES])
+    return {
+        outcome: values.get(STATS_PREFIX + outcome, 0)
+        for outcome in OUTCOMES
+    }
+
+
+def _is_fresh(entry, versions):
+    """Вероятностное раннее истечение (XFetch): чем дольше страница
+    собиралась и чем ближе конец TTL, тем вероятнее пересборка заранее."""
+    if entry['versions'] != versions:
+        return False
+    early = entry['delta'] * EARLY_EXPIRATION_BETA * -math.log(
+        1 - random.random())
+    return time.time() + early < entry['expires']
+
+
+def _serve(entry, outcome):
+    response = entry['response']
+    response['X-Cache'] = outcome.upper()
+    _count(outcome)
+    return response
+
+
+def _lock_key(request, key_prefix):
+    # Ключ блокировки учитывает куки: страницы разных пользователей
+    # собираются независимо, как и хранятся (Vary: Cookie).
+    source = request.build_absolute_uri() + request.META.get(
+        'HTTP_COOKIE', '')
+    return f'page-cache-lock:{key_prefix}:{md5(source.encode()).hexdigest()}'
+
+
+class TaggedPageCache:
+    """Кэш страницы, сбрасываемый по тегам, с защитой от «стада».
+
+    Запись хранит версии тегов, с которыми собрана; устаревшую запись
+    пересобирает один воркер (single-flight), остальные в это время
+    отдают её как есть. Записи живут вдвое дольше timeout, чтобы было
+    что отдавать. В отличие от cache_page, не выставляет браузеру
+    Expires/max-age: свежесть обеспечивает инвалидация, а не TTL.
+    """
+    def __init__(self, view, timeout, tags):
+        self.view = vary_on_cookie(view)
+        self.timeout = timeout
+        self.tags = tags
+        self.key_prefix = f'{view.__module__}.{view.__name__}'
+
+    def __call__(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return self.view(request, *args, **kwargs)
+        versions = _request_versions(request, self.tags, args, kwargs)
+        entry = self.cached_entry(request)
+        if entry is not None and _is_fresh(entry, versions):
+            return _serve(entry, 'hit')
+        lock_key = _lock_key(request, self.key_prefix)
+        if cache.add(lock_key, 1, STAMPEDE_LOCK_TIMEOUT):
+            try:
+                return self.render_and_store(request, versions, args, kwargs)
+            finally:
+                cache.delete(lock_key)
+        if entry is not None:
+            return _serve(entry, 'stale')
+        # Отдать нечего: недолго ждём страницу от соседнего воркера.
+        deadline = time.monotonic() + STAMPEDE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(STAMPEDE_POLL)
+            entry = self.cached_entry(request)
+            if entry is not None and entry['versions'] == versions:
+                return _serve(entry, 'hit')
+        return self.render_and_store(request, versions, args, kwargs)
+
+    def cached_entry(self, request):
+        cache_key = get_cache_key(
+            request, self.key_prefix, 'GET', cache=cache)
+        return cache.get(cache_key) if cache_key else None
+
+    def render_and_store(self, request, versions, args, kwargs):
+        started = time.monotonic()
+        response = self.view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        cache_key = learn_cache_key(
+            request, response, self.timeout * 2, self.key_prefix, cache=cache)
+        cache.set(cache_key, {
+            'versions': versions,
+            'expires': time.time() + self.timeout,
+            'delta': time.monotonic() - started,
+            'response': response,
+        }, self.timeout * 2)
+        response['X-Cache'] = 'MISS'
+        _count('miss')
+        return response
+
+
+def cache_page_tagged(timeout, tags):
+    """tags(request, *args, **kwargs) возвращает теги страницы."""
+    def decorator(view):
+        page_cache = TaggedPageCache(view, timeout, tags)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return page_cache(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def condition_tagged(tags):
+    """ETag и Last-Modified из версий тегов страницы.
+
+    Версии лежат в кэше, поэтому на совпадающий If-None-Match ответ 304
+    уходит до кэша страницы, пагинатора и шаблона, без запросов к базе.
+    Страница зависит от пользователя (шапка, кнопка подписки), поэтому
+    ETag учитывает cookie сессии: она меняется при входе и выходе, а
+    читать её, в отличие от request.user, можно без базы. no-cache велит
+    браузеру и CDN каждый раз переспрашивать, а не угадывать свежесть
+    по Last-Modified.
+    """
+    def etag(request, *args, **kwargs):
+        versions = _request_versions(request, tags, args, kwargs)
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+        source = f'{request.get_full_path()}:{session}:{versions}'
+        return md5(source.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # Версии — миллисекунды: сброс поднимает версию не ниже текущего
+        # времени, так что максимум не раньше последнего изменения.
+        version = max(_request_versions(request, tags, args, kwargs))
+        return datetime.datetime.fromtimestamp(
+            version / 1000, datetime.timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(
+                    response, no_cache=True,
+                    private=settings.SESSION_COOKIE_NAME in request.COOKIES)
+            return response
+        return wrapper
+    return decorator
+
+
+def index_tags(request):
+    return [POSTS_TAG]
+
+
+def group_tags(request, slug):
+    return [group_tag(slug)]
+
+
+def profile_tags(request, username):
+    return [author_tag(username)]
+
+
+def post_detail_tags(request, post_id):
+    # Имя автора и слаг группы меняются редко, поэтому их можно держать
+    # в кэше и не ходить за ними в базу на каждый запрос; при изменении
+    # запись удаляет forget_post_pages.
+    username, slug = cache.get_or_set(
+        f'{POST_PAGE_PREFIX}{post_id}',
+        lambda: Post.objects.filter(pk=post_id).values_list(
+            'author__username', 'group__slug').first(),
+    ) or (None, None)
+    return [
+        post_tag(post_id),
+        author_tag(username),
+        group_tag(slug) if slug else None,
+    ]
+
+
+def post_tags(post, group_slug=None):
+    """Теги всех страниц, на которых виден пост."""
+    return [
+        POSTS_TAG,
+        post_tag(post.pk),
+        author_tag(post.author.username),
+        group_tag(post.group.slug) if post.group_id else None,
+        group_tag(group_slug) if group_slug else None,
+    ]
+
+
+def forget_post_pages(post_ids):
+    """Удаляет закэшированные автора и группу страниц постов.
+
+    Второе удаление после коммита — как в invalidate: параллельный
+    запрос мог успеть прочитать ещё прежние данные.
+    """
+    keys = [f'{POST_PAGE_PREFIX}{post_id}' for post_id in post_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_user(user, previous_username):
+    """Сбрасывает страницы, где видно имя пользователя.
+
+    Карточки его постов обновятся сами: имя автора входит в их ключ.
+    Имена комментаторов в ключ не входят (комментарии загружаются только
+    для несобранных карточек), поэтому сбрасываются теги постов, которые
+    пользователь комментировал.
+    """
+    own = Post.objects.filter(author=user)
+    forget_post_pages(own.values_list('pk', flat=True).iterator())
+    tags = {
+        POSTS_TAG,
+        author_tag(user.username),
+        author_tag(previous_username),
+    }
+    tags.update(
+        group_tag(slug) for slug in own.filter(group__isnull=False)
+        .order_by().values_list('group__slug', flat=True).distinct()
+    )
+    commented = Post.objects.filter(
+        pk__in=Comment.objects.filter(author=user).values('post_id'))
+    for post_id, username, slug in commented.values_list(
+            'pk', 'author__username', 'group__slug').iterator():
+        tags.update((post_tag(post_id), author_tag(username)))
+        if slug:
+            tags.add(group_tag(slug))
+    invalidate(*tags)
+
+
+def invalidate_group(group, previous_slug=None):
+    """Сбрасывает страницы, где видно название и ссылка группы: списки,
+    саму группу, страницы её постов и профили их авторов."""
+    posts = Post.objects.filter(group=group)
+    forget_post_pages(posts.values_list('pk', flat=True).iterator())
+    invalidate(
+        POSTS_TAG,
+        group_tag(group.slug),
+        group_tag(previous_slug) if previous_slug else None,
+        *(
+            author_tag(username) for username in posts.order_by()
+            .values_list('author__username', flat=True).distinct()
+        )
+    )
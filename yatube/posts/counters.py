@@ -0,0 +1,86 @@
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Post, UserCounters
+
+
+def _count(model, field, outer='pk'):
+    """Подзапрос «сколько строк model ссылается на внешнюю строку»."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef(outer)}
+        ).order_by().values(field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def _shift(field, delta):
+    # Разошедшийся счётчик не уходит ниже нуля: иначе UPDATE нарушит
+    # CHECK у PositiveIntegerField, и упадёт удаление поста или подписки.
+    return Greatest(F(field) + delta, 0)
+
+
+def change_user_counters(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя: posts_count=1 и т.п."""
+    UserCounters.objects.filter(user_id=user_id).update(**{
+        field: _shift(field, delta) for field, delta in deltas.items()
+    })
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=_shift('comment_count', delta))
+
+
+def user_counters(user):
+    """Счётчики пользователя; если строки ещё нет (пользователи из
+    bulk_create до repair_counters), считает их запросами, не сохраняя."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(
+            user=user,
+            posts_count=Post.objects.filter(author=user).count(),
+            followers_count=user.following.count(),
+            following_count=user.follower.count(),
+        )
+
+
+def recount_comments(post_ids):
+    """Пересчитывает comment_count постов после массового удаления."""
+    Post.objects.filter(pk__in=post_ids).update(
+        comment_count=_count(Comment, 'post'))
+
+
+def recount_posts(user_ids):
+    """Пересчитывает posts_count авторов после массового удаления."""
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        posts_count=_count(Post, 'author', outer='user'))
+
+
+def recompute_all(apps=global_apps):
+    """Пересчитывает все счётчики набором UPDATE ... SELECT.
+
+    Принимает реестр приложений, чтобы работать и из миграции.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    missing = User.objects.filter(counters__isnull=True).values_list(
+        'pk', flat=True)
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id) for user_id in missing],
+        # Размер пачки выбирает бэкенд: в SQLite вставка идёт через
+        # UNION ALL, а в нём не больше 500 SELECT.
+        ignore_conflicts=True
+    )
+    Post.objects.update(comment_count=_count(Comment, 'post'))
+    UserCounters.objects.update(
+        posts_count=_count(Post, 'author', outer='user'),
+        followers_count=_count(Follow, 'author', outer='user'),
+        following_count=_count(Follow, 'user', outer='user'),
+    )
@@ -0,0 +1,199 @@
+"""Потоковая выгрузка постов, комментариев, подписок и групп.
+
+Строки читаются через values_list(...).iterator(chunk_size): моделей не
+создаём, PostgreSQL отдаёт строки курсором на сервере, SQLite — порциями
+fetchmany. Архив пишется в поток без перемотки, поэтому память не
+зависит от объёма ни в команде export_data, ни в ответе вьюхи. Колонки
+совпадают с import_data: выгрузку можно загрузить обратно.
+"""
+import csv
+import datetime
+import json
+import os
+import time
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+# Порядок как в import_data: сначала то, на что ссылаются.
+KINDS = ('groups', 'posts', 'comments', 'follows')
+COLUMNS = {
+    'groups': {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    },
+    'posts': {
+        'id': 'id',
+        'text': 'text',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comments': {
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follows': {
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+# Текст копится в куски примерно такого размера: писать в архив
+# по строке медленно.
+WRITE_SIZE = 64 * 1024
+
+
+def querysets(username=None, group=None):
+    """Что выгружать: всё, данные пользователя или группы.
+
+    Пользователю отдаются его посты и комментарии, подписки в обе
+    стороны и группы его постов — без них посты не загрузить обратно.
+    """
+    if username:
+        return {
+            'groups': Group.objects.filter(
+                posts__author__username=username).distinct(),
+            'posts': Post.objects.filter(author__username=username),
+            'comments': Comment.objects.filter(author__username=username),
+            'follows': Follow.objects.filter(
+                Q(user__username=username) | Q(author__username=username)),
+        }
+    if group:
+        return {
+            'groups': Group.objects.filter(slug=group),
+            'posts': Post.objects.filter(group__slug=group),
+            'comments': Comment.objects.filter(post__group__slug=group),
+            'follows': Follow.objects.none(),
+        }
+    return {
+        'groups': Group.objects.all(),
+        'posts': Post.objects.all(),
+        'comments': Comment.objects.all(),
+        'follows': Follow.objects.all(),
+    }
+
+
+def rows(kind, queryset, chunk_size=CHUNK_SIZE):
+    columns = COLUMNS[kind]
+    values = queryset.order_by('pk').values_list(*columns.values())
+    for row in values.iterator(chunk_size=chunk_size):
+        yield {
+            column: (
+                value.isoformat() if isinstance(value, datetime.datetime)
+                else value
+            )
+            for column, value in zip(columns, row)
+        }
+
+
+class _Echo:
+    """Файл для csv.writer, который просто возвращает строку."""
+    def write(self, value):
+        return value
+
+
+def lines(kind, items, fmt):
+    """Строки файла выгрузки в формате jsonl или csv."""
+    if fmt == 'jsonl':
+        for row in items:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    elif fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(COLUMNS[kind])
+        for row in items:
+            yield writer.writerow(
+                '' if value is None else value for value in row.values())
+    else:
+        raise ValueError(f'Неизвестный формат: {fmt}')
+
+
+def encoded(strings, size=WRITE_SIZE):
+    chunk = []
+    length = 0
+    for line in strings:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk).encode()
+            chunk = []
+            length = 0
+    if chunk:
+        yield ''.join(chunk).encode()
+
+
+def images(posts):
+    """Картинки постов как пары (имя файла, куски): имя совпадает
+    с тем, что ищет import_data --images. Пропавшие файлы пропускаются."""
+    names = posts.exclude(image='').exclude(image__isnull=True).order_by(
+        'pk').values_list('image', flat=True)
+    for name in names.iterator(chunk_size=CHUNK_SIZE):
+        if not default_storage.exists(name):
+            continue
+        with default_storage.open(name) as file:
+            yield os.path.basename(name), file.chunks()
+
+
+class _Pipe:
+    """Поток только на запись: ZipFile пишет, генератор забирает.
+
+    seek нет, поэтому ZipFile пишет размеры после данных каждого файла
+    и не возвращается назад.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def archive(sources, fmt='jsonl', with_images=False,
+            chunk_size=CHUNK_SIZE):
+    """Zip-архив выгрузки кусками байтов: по файлу на вид данных
+    и папка images/ с картинками постов."""
+    pipe = _Pipe()
+    date_time = time.localtime()[:6]
+
+    def entry(archive_file, name, chunks, compress):
+        info = zipfile.ZipInfo(name, date_time)
+        info.compress_type = (
+            zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        with archive_file.open(info, 'w', force_zip64=True) as file:
+            for chunk in chunks:
+                file.write(chunk)
+                data = pipe.drain()
+                if data:
+                    yield data
+
+    with zipfile.ZipFile(pipe, 'w') as archive_file:
+        for kind in KINDS:
+            yield from entry(archive_file, f'{kind}.{fmt}', encoded(lines(
+                kind, rows(kind, sources[kind], chunk_size), fmt)), True)
+        if with_images:
+            for name, chunks in images(sources['posts']):
+                # Картинки уже сжаты: пересжимать — только тратить время.
+                yield from entry(
+                    archive_file, f'images/{name}', chunks, False)
+    yield pipe.drain()
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import FeedItem, Follow, Post, UserCounters
+
+CELEBRITIES_CACHE_KEY = 'feed:celebrities'
+CELEBRITIES_CACHE_TIMEOUT = 300
+BATCH_SIZE = 1000
+# Порядок ленты подписок для пагинатора: поля аннотаций из feed_posts.
+FEED_ORDERING = ('-feed_date', '-feed_id')
+
+
+def inbox_enabled():
+    return bool(settings.CONSTANTS['FEED_INBOX'])
+
+
+def celebrity_ids():
+    """Авторы, чьи посты не раскладываются по лентам, а читаются напрямую.
+
+    Набор берётся из счётчиков подписчиков и кэшируется ненадолго;
+    переход автора через порог сбрасывает его (crossed_threshold).
+    """
+    celebrities = cache.get(CELEBRITIES_CACHE_KEY)
+    if celebrities is None:
+        celebrities = set(UserCounters.objects.filter(
+            followers_count__gte=settings.CONSTANTS[
+                'FEED_CELEBRITY_FOLLOWERS']
+        ).values_list('user_id', flat=True))
+        cache.set(
+            CELEBRITIES_CACHE_KEY, celebrities, CELEBRITIES_CACHE_TIMEOUT)
+    return celebrities
+
+
+def crossed_threshold(author_id, delta):
+    """Перешёл ли автор порог «звезды» после подписки (delta=1) или
+    отписки (delta=-1); если да, набор «звёзд» сбрасывается.
+
+    Вызывается в транзакции, которая уже сдвинула счётчик: UPDATE
+    счётчика упорядочивает параллельные подписки, поэтому переход
+    видит ровно одна из них.
+    """
+    threshold = settings.CONSTANTS['FEED_CELEBRITY_FOLLOWERS']
+    followers = UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    if followers != (threshold if delta > 0 else threshold - 1):
+        return False
+    cache.delete(CELEBRITIES_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(CELEBRITIES_CACHE_KEY))
+    return True
+
+
+def _bulk_insert(items):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Кладёт новый пост во входящие ленты подписчиков автора."""
+    if post.author_id in celebrity_ids():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedItem(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def add_author_to_inbox(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if author_id in celebrity_ids():
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')
+    _bulk_insert(
+        FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def backfill_author(author_id):
+    """Раскладывает все посты автора всем его подписчикам; повторы
+    пропускаются."""
+    if author_id in celebrity_ids():
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        add_author_to_inbox(user_id, author_id)
+
+
+def remove_author_from_inbox(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def feed_posts(user):
+    """Посты ленты подписок.
+
+    Обычные авторы читаются из материализованных входящих (одно
+    индексированное чтение по user_id, pub_date), посты «звёзд» с
+    огромным числом подписчиков подмешиваются запросом на чтение.
+
+    Сортировать ленту нужно по FEED_ORDERING: для входящих это поля
+    FeedItem, и страница читается прямо из индекса (user, -pub_date).
+    """
+    if not inbox_enabled():
+        posts = Post.objects.filter(author__following__user=user)
+        return posts.annotate(feed_date=F('pub_date'), feed_id=F('id'))
+    celebrities = list(Follow.objects.filter(
+        user=user, author_id__in=celebrity_ids()
+    ).values_list('author_id', flat=True))
+    if not celebrities:
+        # Аннотации переиспользуют соединение с FeedItem из фильтра.
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_id=F('feed_entries__post_id'),
+        )
+    return Post.objects.filter(
+        Q(id__in=FeedItem.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrities)
+    ).annotate(feed_date=F('pub_date'), feed_id=F('id'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feed
+from posts.models import FeedItem, Follow
+
+
+class Command(BaseCommand):
+    help = 'Заполняет входящие ленты подписок по существующим Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Очистить ленты перед заполнением',
+        )
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        with transaction.atomic():
+            if options['clear']:
+                FeedItem.objects.all().delete()
+            for number, (user_id, author_id) in enumerate(
+                    follows.iterator(), start=1):
+                feed.add_author_to_inbox(user_id, author_id)
+                if number % feed.BATCH_SIZE == 0:
+                    self.stdout.write(f'Обработано подписок: {number}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {FeedItem.objects.count()}'))
@@ -0,0 +1,211 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import caching, feed
+from posts.bulk import (
+    BATCH_SIZE, batches, explicit_dates, indexes_dropped, read_rows
+)
+from posts.models import Comment, Follow, Group, Post, User
+
+# Порядок важен: посты ссылаются на пользователей и группы,
+# комментарии — на посты.
+KINDS = ('users', 'groups', 'posts', 'comments', 'follows')
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Command(BaseCommand):
+    help = ('Загружает пользователей, группы, посты, комментарии и подписки '
+            'из CSV или JSONL пачками через bulk_create. Файлы читаются '
+            'потоком, ссылки ищутся в базе по пачке, поэтому память не '
+            'зависит от размера файлов. Пользователи и посты ссылаются '
+            'друг на друга по username и slug, комментарии на посты — по id.')
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument(f'--{kind}', help='Файл .csv или .jsonl.')
+        parser.add_argument(
+            '--images',
+            help='Папка с картинками: колонка image поста — имя файла в ней.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не удалять индексы на время загрузки.')
+        parser.add_argument('--skip-feed', action='store_true')
+        parser.add_argument(
+            '--thumbnail-workers', type=int, default=4,
+            help='Потоки для миниатюр загруженных картинок (--images).')
+
+    def handle(self, *args, **options):
+        if not any(options[kind] for kind in KINDS):
+            raise CommandError(
+                'Укажите хотя бы один файл: '
+                + ', '.join(f'--{kind}' for kind in KINDS))
+        self.options = options
+        self.skipped = 0
+        models = () if options['keep_indexes'] else (Post, Comment)
+        with indexes_dropped(*models), explicit_dates(
+                Post._meta.get_field('pub_date'),
+                Comment._meta.get_field('created')):
+            for kind in KINDS:
+                if options[kind]:
+                    self.load(kind, options[kind])
+        if self.skipped:
+            self.stderr.write(f'Пропущено строк с неизвестными ссылками: '
+                              f'{self.skipped}')
+        self.stdout.write('Счётчики, ленты и поисковый индекс')
+        with transaction.atomic():
+            self.reset_sequences()
+            call_command('repair_counters', stdout=self.stdout)
+            if feed.inbox_enabled() and not options['skip_feed']:
+                call_command('backfill_feed', stdout=self.stdout)
+            call_command('reindex_search', stdout=self.stdout)
+        caching.invalidate(caching.POSTS_TAG)
+        if options['images']:
+            # Миниатюры ставят в очередь вьюхи, а загрузка идёт мимо
+            # них: нарезаем по готовой таблице.
+            call_command(
+                'warm_thumbnails', workers=options['thumbnail_workers'],
+                stdout=self.stdout)
+
+    def load(self, kind, path):
+        loader = getattr(self, f'load_{kind}')
+        started = time.perf_counter()
+        total = 0
+        try:
+            for batch in batches(read_rows(path), self.options['batch_size']):
+                with transaction.atomic():
+                    loader(batch)
+                total += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{kind}: {total} строк, '
+                    f'{total / max(elapsed, 1e-9):.0f} строк/с')
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'{path}: {error!r}')
+
+    def users(self, usernames):
+        return dict(User.objects.filter(
+            username__in=set(usernames)).values_list('username', 'id'))
+
+    def load_users(self, rows):
+        User.objects.bulk_create([
+            User(
+                username=row['username'],
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                email=row.get('email') or '',
+                # Только готовый хеш: пароли открытым текстом в файлах
+                # выгрузки не ждём. '!' — вход по паролю невозможен.
+                password=row.get('password') or '!',
+            )
+            for row in rows
+        ], ignore_conflicts=True)
+
+    def load_groups(self, rows):
+        Group.objects.bulk_create([
+            Group(
+                slug=row['slug'],
+                title=row['title'],
+                description=row.get('description') or '',
+            )
+            for row in rows
+        ], ignore_conflicts=True)
+
+    def load_posts(self, rows):
+        users = self.users(row['author'] for row in rows)
+        groups = dict(Group.objects.filter(
+            slug__in={row['group'] for row in rows if row.get('group')},
+        ).values_list('slug', 'id'))
+        posts = []
+        for row in rows:
+            group = row.get('group')
+            if row['author'] not in users or group and group not in groups:
+                self.skipped += 1
+                continue
+            posts.append(Post(
+                id=row.get('id') or None,
+                text=row['text'],
+                author_id=users[row['author']],
+                group_id=groups[group] if group else None,
+                pub_date=_date(row.get('pub_date')),
+                image=self.image(row.get('image')),
+            ))
+        Post.objects.bulk_create(posts)
+        caching.invalidate(*[
+            caching.author_tag(username)
+            for username in {row['author'] for row in rows}
+        ], *[caching.group_tag(slug) for slug in groups])
+
+    def image(self, name):
+        if not name or not self.options['images']:
+            return ''
+        path = os.path.join(self.options['images'], os.path.basename(name))
+        with open(path, 'rb') as file:
+            return default_storage.save(
+                Post._meta.get_field('image').upload_to + os.path.basename(
+                    name),
+                File(file))
+
+    def load_comments(self, rows):
+        users = self.users(row['author'] for row in rows)
+        post_ids = set(Post.objects.filter(
+            id__in={int(row['post']) for row in rows},
+        ).values_list('id', flat=True))
+        comments = []
+        for row in rows:
+            if row['author'] not in users or int(row['post']) not in post_ids:
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                post_id=int(row['post']),
+                author_id=users[row['author']],
+                text=row['text'],
+                created=_date(row.get('created')),
+            ))
+        Comment.objects.bulk_create(comments)
+        caching.invalidate(*[
+            caching.post_tag(post_id) for post_id in post_ids])
+
+    def load_follows(self, rows):
+        users = self.users(
+            name for row in rows for name in (row['user'], row['author']))
+        follows = []
+        for row in rows:
+            if (row['user'] not in users or row['author'] not in users
+                    or row['user'] == row['author']):
+                self.skipped += 1
+                continue
+            follows.append(Follow(
+                user_id=users[row['user']],
+                author_id=users[row['author']],
+            ))
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        caching.invalidate(*[
+            caching.author_tag(username) for username in users])
+
+    def reset_sequences(self):
+        """Посты с явными id не двигают счётчик первичного ключа
+        в PostgreSQL: без сброса следующий новый пост получит занятый id."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Post]):
+                cursor.execute(sql)
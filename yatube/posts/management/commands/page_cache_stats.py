@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.caching import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и устаревшие ответы кэша страниц.'
+
+    def handle(self, *args, **options):
+        for outcome, total in page_cache_stats().items():
+            self.stdout.write(f'{outcome}: {total}')
@@ -0,0 +1,163 @@
+import datetime
+import random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from posts import feed
+from posts.bulk import batches, explicit_dates
+from posts.models import Comment, Follow, Group, Post, User
+
+# Тексты берутся из заранее сгенерированного набора: Faker на миллион
+# постов — это минуты только на генерацию.
+TEXTS = 20000
+# Доля постов с длинными обсуждениями и число комментариев в них.
+HEAVY_SHARE = 0.01
+HEAVY_COMMENTS = (50, 200)
+# Показатель степенного распределения: чем больше, тем сильнее
+# популярные пользователи (первые id) перетягивают посты и подписчиков.
+SKEW = 3
+
+
+def _skewed(ids):
+    return ids[int(len(ids) * random.random() ** SKEW)]
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу данными для route_benchmark: пользователи, '
+            'группы, посты со степенным распределением авторов, подписки '
+            'на популярных авторов и посты с длинными обсуждениями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--comments', type=float, default=1,
+            help='Среднее число комментариев к обычному посту.')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-feed', action='store_true',
+            help='Не заполнять входящие ленты: при FEED_INBOX это самая '
+                 'долгая часть, каждая подписка копирует посты автора.')
+
+    def handle(self, *args, **options):
+        if Post.objects.exists():
+            raise CommandError('В базе уже есть посты: нужна пустая база')
+        random.seed(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.mixer = Mixer(commit=False)
+        self.texts = [self.fake.text(300) for _ in range(TEXTS)]
+        self.now = timezone.now()
+        self.start = self.now - datetime.timedelta(days=options['days'])
+        with transaction.atomic():
+            user_ids = self.seed_users(options['users'])
+            group_ids = self.seed_groups(options['groups'])
+            self.seed_follows(user_ids, options['follows'])
+            with explicit_dates(
+                    Post._meta.get_field('pub_date'),
+                    Comment._meta.get_field('created')):
+                self.seed_posts(user_ids, group_ids, options)
+            self.stdout.write('Счётчики, ленты и поисковый индекс')
+            call_command('repair_counters', stdout=self.stdout)
+            if feed.inbox_enabled() and not options['skip_feed']:
+                call_command('backfill_feed', stdout=self.stdout)
+            call_command('reindex_search', stdout=self.stdout)
+
+    def seed_users(self, count):
+        for batch in batches(range(count)):
+            User.objects.bulk_create([
+                self.mixer.blend(
+                    User,
+                    username=f'user{number}',
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    password='!',
+                    is_active=True,
+                    is_staff=False,
+                    is_superuser=False,
+                )
+                for number in batch
+            ])
+        self.stdout.write(f'Пользователей: {count}')
+        return list(User.objects.order_by('id').values_list('id', flat=True))
+
+    def seed_groups(self, count):
+        Group.objects.bulk_create([
+            self.mixer.blend(
+                Group,
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{number}',
+                description=random.choice(self.texts),
+            )
+            for number in range(count)
+        ])
+        self.stdout.write(f'Групп: {count}')
+        return list(Group.objects.order_by('id').values_list('id', flat=True))
+
+    def seed_follows(self, user_ids, average):
+        def follows():
+            for user_id in user_ids:
+                authors = {
+                    _skewed(user_ids)
+                    for _ in range(int(random.expovariate(1 / average)))
+                }
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        total = 0
+        for batch in batches(follows()):
+            Follow.objects.bulk_create(batch)
+            total += len(batch)
+        self.stdout.write(f'Подписок: {total}')
+
+    def seed_posts(self, user_ids, group_ids, options):
+        count = options['posts']
+        step = (self.now - self.start) / max(count, 1)
+        total_comments = 0
+        for batch in batches(range(count)):
+            posts = Post.objects.bulk_create([
+                Post(
+                    author_id=_skewed(user_ids),
+                    group_id=(
+                        random.choice(group_ids)
+                        if group_ids and random.random() < 0.5 else None),
+                    text=random.choice(self.texts),
+                    pub_date=self.start + step * number,
+                )
+                for number in batch
+            ])
+            if posts[0].pk is None:
+                # Бэкенд не вернул первичные ключи (SQLite): добираем.
+                posts = list(Post.objects.order_by('-id')[:len(posts)])
+            comments = list(self.comments_for(posts, user_ids, options))
+            Comment.objects.bulk_create(comments)
+            total_comments += len(comments)
+            self.stdout.write(
+                f'Постов: {batch[-1] + 1}, комментариев: {total_comments}')
+
+    def comments_for(self, posts, user_ids, options):
+        for post in posts:
+            if random.random() < HEAVY_SHARE:
+                number = random.randint(*HEAVY_COMMENTS)
+            elif options['comments']:
+                number = int(random.expovariate(1 / options['comments']))
+            else:
+                number = 0
+            for _ in range(number):
+                yield Comment(
+                    post_id=post.pk,
+                    author_id=random.choice(user_ids),
+                    text=random.choice(self.texts)[:200],
+                    created=post.pub_date + datetime.timedelta(
+                        minutes=random.randint(1, 60 * 24)),
+                )
@@ -0,0 +1,73 @@
+from concurrent.futures import (
+    FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+)
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts.bulk import id_chunks
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail
+
+QUEUE_PER_WORKER = 4
+
+
+def _generate(post_id):
+    try:
+        return generate_thumbnail(post_id)
+    finally:
+        close_old_connections()
+
+
+def _unordered(pool, function, items, limit):
+    """Как pool.map, но в пуле не больше limit задач, а результаты
+    отдаются по готовности: очередь и ответы не копятся в памяти."""
+    pending = set()
+    for item in items:
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from (future.result() for future in done)
+        pending.add(pool.submit(function, item))
+    yield from (future.result() for future in as_completed(pending))
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры и адаптивные варианты картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать и уже готовые миниатюры',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Размер пула потоков; 0 — создавать в текущем потоке',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(thumbnail_url='')
+        workers = options['workers']
+        # id читаются короткими пачками: открытый курсор на posts_post
+        # мешал бы потокам пула записывать миниатюры.
+        post_ids = (
+            post_id for chunk in id_chunks(posts) for post_id in chunk)
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                done = self.report(_unordered(
+                    pool, _generate, post_ids, workers * QUEUE_PER_WORKER))
+        else:
+            done = self.report(map(generate_thumbnail, post_ids))
+        self.stdout.write(self.style.SUCCESS(f'Готово миниатюр: {done}'))
+
+    def report(self, results):
+        done = 0
+        for _ in results:
+            done += 1
+            if done % 100 == 0:
+                self.stdout.write(f'Готово миниатюр: {done}')
+        return done
@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
@@ -24,7 +26,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -33,7 +36,8 @@ class Post(models.Model):
         null=True,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Группа, к которой будет относиться пост'
+        help_text='Группа, к которой будет относиться пост',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
@@ -41,20 +45,55 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        # Под каждую ленту: сортировка (-pub_date, -id) из пагинатора
+        # читается из индекса, без сортировки всех подходящих строк.
+        # Отдельные индексы по author и group не нужны: это префиксы.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:settings.CONSTANTS['LETTERS_PER_POST']]
 
+    @property
+    def variants(self):
+        """Описание адаптивных вариантов картинки (см. posts.variants)."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
-        verbose_name='Пост'
+        verbose_name='Пост',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -68,10 +107,17 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(
         verbose_name='Дата публикации комментария',
-        auto_now_add=True,
-        db_index=True
+        auto_now_add=True
     )
 
+    class Meta:
+        # Комментарии всегда читаются по посту в порядке создания.
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.text
 
@@ -95,3 +141,66 @@ class Follow(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user.username} подписан на {self.author.username}'
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    def __str__(self) -> str:
+        return f'Счётчики пользователя {self.user_id}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_post_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Пост {self.post_id} в ленте {self.user_id}'
+
+
+class SearchTerm(models.Model):
+    """Инвертированный индекс поиска: основа слова → пост (posts.search)."""
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    weight = models.FloatField('Вес в посте')
+
+    class Meta:
+        unique_together = ['term', 'post']
+
+    def __str__(self) -> str:
+        return f'{self.term} в посте {self.post_id}'
@@ -0,0 +1,107 @@
+"""Массовые операции модерации над постами и комментариями.
+
+Работают наборами, а не по объекту: UPDATE и DELETE на пачку id без
+загрузки строк и без сигналов. Поэтому всё, что обычно делают сигналы
+(posts.signals), здесь делается явно и тоже пачками: зависимые строки,
+поисковый индекс, счётчики и теги кэша. Выборка обходится по id
+(keyset) пачками по CHUNK_SIZE, каждая пачка — своя транзакция:
+память и время блокировки не растут с размером выборки.
+"""
+from django.db import models, router, transaction
+
+from . import caching, counters, search
+from .bulk import id_chunks
+from .models import Comment, Post
+
+CHUNK_SIZE = 1000
+
+
+def _raw_delete(queryset):
+    """Один DELETE без загрузки объектов — как быстрое удаление в Collector.
+
+    Сигналы не отправляются, каскады не выполняются.
+    """
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def _page_tags(post_ids):
+    """Теги страниц, на которых видны посты.
+
+    Страница поста помечена и тегом автора, поэтому отдельные теги
+    постов не нужны: их число росло бы с выборкой.
+    """
+    tags = {caching.POSTS_TAG}
+    rows = Post.objects.filter(id__in=post_ids).order_by().values_list(
+        'author__username', 'group__slug').distinct()
+    for username, slug in rows:
+        tags.add(caching.author_tag(username))
+        if slug:
+            tags.add(caching.group_tag(slug))
+    return tags
+
+
+def reassign_group(queryset, group):
+    """Переносит посты выборки в группу (None — убрать группу)."""
+    moved = 0
+    for ids in id_chunks(queryset, CHUNK_SIZE):
+        with transaction.atomic():
+            tags = _page_tags(ids)
+            moved += Post.objects.filter(id__in=ids).update(group=group)
+            caching.forget_post_pages(ids)
+            caching.invalidate(
+                *tags, caching.group_tag(group.slug) if group else None)
+    return moved
+
+
+def purge_comments(queryset):
+    """Удаляет все комментарии к постам выборки."""
+    deleted = 0
+    for ids in id_chunks(queryset, CHUNK_SIZE):
+        with transaction.atomic():
+            deleted += _raw_delete(Comment.objects.filter(post_id__in=ids))
+            Post.objects.filter(id__in=ids).update(comment_count=0)
+            caching.invalidate(*_page_tags(ids))
+    return deleted
+
+
+def _delete_post_chunk(ids):
+    tags = _page_tags(ids)
+    authors = set(Post.objects.filter(id__in=ids).values_list(
+        'author_id', flat=True))
+    # Каскад ORM здесь не работает: удаляем зависимые строки сами.
+    for relation in Post._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            _raw_delete(relation.related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': ids}))
+    search.remove_posts(ids)
+    deleted = _raw_delete(Post.objects.filter(id__in=ids))
+    counters.recount_posts(authors)
+    caching.invalidate(*tags)
+    return deleted
+
+
+def delete_posts(queryset):
+    """Удаляет посты выборки вместе с комментариями и записями лент."""
+    deleted = 0
+    for ids in id_chunks(queryset, CHUNK_SIZE):
+        with transaction.atomic():
+            deleted += _delete_post_chunk(ids)
+    return deleted
+
+
+def delete_authors_content(author_ids):
+    """Удаляет все посты и комментарии авторов (спам).
+
+    Возвращает число удалённых постов и комментариев.
+    """
+    posts = delete_posts(Post.objects.filter(author_id__in=author_ids))
+    comments = 0
+    for ids in id_chunks(
+            Comment.objects.filter(author_id__in=author_ids), CHUNK_SIZE):
+        with transaction.atomic():
+            post_ids = set(Comment.objects.filter(id__in=ids).values_list(
+                'post_id', flat=True))
+            comments += _raw_delete(Comment.objects.filter(id__in=ids))
+            counters.recount_comments(post_ids)
+            caching.invalidate(*_page_tags(post_ids))
+    return posts, comments
@@ -0,0 +1,243 @@
+"""Полнотекстовый поиск по постам.
+
+Текст разбивается на основы слов (posts.stemmer) и кладётся в индекс
+одного из бэкендов:
+
+* fts5 — виртуальная таблица SQLite FTS5, ранжирование bm25;
+* inverted — инвертированный индекс в таблице SearchTerm (основа → пост,
+  вес 1 + ln tf), ранжирование tf-idf; работает на любой базе.
+
+SEARCH_BACKEND = 'auto' выбирает fts5, если база — SQLite с FTS5.
+Индекс обновляется сигналами при сохранении и удалении поста, целиком
+пересобирается командой reindex_search.
+"""
+import math
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from .models import Post
+from .stemmer import terms
+from .utils import feed_queryset
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERM_LENGTH = 64
+BATCH_SIZE = 500
+
+
+@lru_cache(maxsize=None)
+def fts5_supported():
+    """Собран ли модуль sqlite3 этого процесса с FTS5."""
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE probe USING fts5(body)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def backend_name(connection):
+    name = settings.SEARCH_BACKEND
+    if name == 'auto':
+        fts5 = connection.vendor == 'sqlite' and fts5_supported()
+        return 'fts5' if fts5 else 'inverted'
+    return name
+
+
+def query_terms(query):
+    """Основы слов запроса без повторов, в исходном порядке."""
+    return list(dict.fromkeys(
+        term[:MAX_TERM_LENGTH] for term in terms(query)))
+
+
+class FTS5Backend:
+    def __init__(self, using):
+        self.using = using
+
+    def execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    def match(query_terms):
+        # Каждая основа в кавычках: пробелы между ними — это AND.
+        return ' '.join(f'"{term}"' for term in query_terms)
+
+    def add(self, rows):
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                [(post_id, ' '.join(terms(text))) for post_id, text in rows])
+
+    def remove(self, post_ids):
+        with connections[self.using].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(post_id,) for post_id in post_ids])
+
+    def clear(self):
+        self.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def count(self, query_terms):
+        return self.execute(
+            f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self.match(query_terms)])[0][0]
+
+    def ranked_ids(self, query_terms, offset, limit):
+        return [row[0] for row in self.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+            [self.match(query_terms), limit, offset])]
+
+    def matching_ids(self, query_terms):
+        # Подзапрос-QuerySet: RawSQL внутри id__in Django оборачивает
+        # в лишние скобки, и SQLite берёт из него только первую строку.
+        table = Post._meta.db_table
+        return Post.objects.using(self.using).extra(
+            where=[f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+                   f'WHERE {FTS_TABLE} MATCH %s)'],
+            params=[self.match(query_terms)],
+        ).values('id')
+
+
+class InvertedIndexBackend:
+    def __init__(self, using, apps=global_apps):
+        self.using = using
+        self.term_model = apps.get_model('posts', 'SearchTerm')
+        self.post_model = apps.get_model('posts', 'Post')
+
+    def add(self, rows):
+        manager = self.term_model.objects.using(self.using)
+        manager.filter(post_id__in=[post_id for post_id, _ in rows]).delete()
+        manager.bulk_create([
+            self.term_model(
+                term=term, post_id=post_id, weight=1 + math.log(frequency))
+            for post_id, text in rows
+            for term, frequency in Counter(
+                term[:MAX_TERM_LENGTH] for term in terms(text)).items()
+        ], batch_size=BATCH_SIZE)
+
+    def remove(self, post_ids):
+        self.term_model.objects.using(self.using).filter(
+            post_id__in=post_ids).delete()
+
+    def clear(self):
+        self.term_model.objects.using(self.using).all().delete()
+
+    def _matches(self, query_terms):
+        """Посты, в которых есть все основы запроса."""
+        return self.term_model.objects.using(self.using).filter(
+            term__in=query_terms
+        ).values('post').annotate(
+            matched=Count('id')
+        ).filter(matched=len(query_terms))
+
+    def count(self, query_terms):
+        return self._matches(query_terms).count()
+
+    def ranked_ids(self, query_terms, offset, limit):
+        frequencies = dict(
+            self.term_model.objects.using(self.using).filter(
+                term__in=query_terms
+            ).values_list('term').annotate(Count('id')))
+        if len(frequencies) < len(query_terms):
+            return []
+        total = self.post_model.objects.using(self.using).count()
+        score = Sum(F('weight') * Case(
+            *[When(term=term, then=Value(math.log(1 + total / frequency)))
+              for term, frequency in frequencies.items()],
+            output_field=FloatField(),
+        ))
+        ranked = self._matches(query_terms).annotate(
+            score=score).order_by('-score', '-post_id')
+        return [
+            row['post'] for row in ranked[offset:offset + limit]]
+
+    def matching_ids(self, query_terms):
+        return self._matches(query_terms).values('post')
+
+
+def get_backend(using=None, apps=global_apps, write=False):
+    if using is None:
+        using = (router.db_for_write if write else router.db_for_read)(Post)
+    if backend_name(connections[using]) == 'fts5':
+        return FTS5Backend(using)
+    return InvertedIndexBackend(using, apps)
+
+
+class SearchResults:
+    """Ранжированная выдача для Paginator: считает и режет лениво."""
+    def __init__(self, query):
+        self.terms = query_terms(query)
+        self.backend = get_backend()
+
+    def count(self):
+        if not self.terms:
+            return 0
+        if not hasattr(self, '_count'):
+            self._count = self.backend.count(self.terms)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('SearchResults поддерживает только срезы')
+        if not self.terms:
+            return []
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        ids = self.backend.ranked_ids(self.terms, start, stop - start)
+        posts = feed_queryset(Post.objects.all()).in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def search(query):
+    return SearchResults(query)
+
+
+def matching_post_ids(query):
+    """Выражение для filter(id__in=...): посты со всеми словами запроса."""
+    query = query_terms(query)
+    if not query:
+        return []
+    return get_backend().matching_ids(query)
+
+
+def index_post(post):
+    get_backend(write=True).add([(post.pk, post.text)])
+
+
+def remove_post(post_id):
+    remove_posts([post_id])
+
+
+def remove_posts(post_ids):
+    get_backend(write=True).remove(post_ids)
+
+
+def reindex(apps=global_apps, using=None, batch_size=BATCH_SIZE):
+    """Пересобирает индекс целиком; возвращает число постов."""
+    backend = get_backend(using, apps, write=True)
+    backend.clear()
+    posts = apps.get_model('posts', 'Post').objects.using(
+        backend.using).values_list('id', 'text').order_by('id')
+    batch, total = [], 0
+    for row in posts.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            backend.add(batch)
+            total += len(batch)
+            batch = []
+    backend.add(batch)
+    return total + len(batch)
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from . import caching, counters, feed, search, tasks
+from .models import Comment, Follow, Group, Post, UserCounters
+
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def user_before_save(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    # Запоминаем прежнее имя: оно есть на закэшированных страницах.
+    # Вход сохраняет только last_login — лишний запрос не нужен.
+    instance._previous_names = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+            USER_NAME_FIELDS):
+        return
+    instance._previous_names = sender.objects.filter(
+        pk=instance.pk).values_list(*USER_NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_renamed(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    current = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if previous is not None and previous != current:
+        caching.invalidate_user(instance, previous_username=previous[0])
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    counters.change_user_counters(instance.author_id, posts_count=1)
+    if feed.inbox_enabled():
+        enqueue(
+            tasks.fan_out_post,
+            key=f'fan-out:{instance.pk}',
+            post_id=instance.pk,
+        )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comment_count(instance.post_id, 1)
+        enqueue(
+            tasks.notify_comment,
+            key=f'comment-mail:{instance.pk}',
+            comment_id=instance.pk,
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    counters.change_user_counters(instance.author_id, followers_count=1)
+    counters.change_user_counters(instance.user_id, following_count=1)
+    if feed.inbox_enabled():
+        feed.crossed_threshold(instance.author_id, 1)
+        enqueue(
+            tasks.sync_inbox,
+            key=f'inbox:follow:{instance.pk}',
+            user_id=instance.user_id,
+            author_id=instance.author_id,
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, followers_count=-1)
+    counters.change_user_counters(instance.user_id, following_count=-1)
+    if feed.inbox_enabled():
+        if feed.crossed_threshold(instance.author_id, -1):
+            # Пока автор был «звездой», его посты и подписки на него
+            # входящие не пополняли — раскладываем их сейчас.
+            enqueue(
+                tasks.backfill_author,
+                key=f'feed-backfill:{instance.pk}',
+                author_id=instance.author_id,
+            )
+        enqueue(
+            tasks.sync_inbox,
+            key=f'inbox:unfollow:{instance.pk}',
+            user_id=instance.user_id,
+            author_id=instance.author_id,
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Без ключа: каждая правка должна переиндексировать пост.
+        enqueue(tasks.index_post, post_id=instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_before_save(sender, instance, raw=False, **kwargs):
+    # Запоминаем прежнюю группу: её страница тоже устаревает.
+    instance._previous_group_slug = None
+    if instance.pk and not raw:
+        instance._previous_group_slug = Post.objects.filter(
+            pk=instance.pk).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    caching.forget_post_pages([instance.pk])
+    caching.invalidate(*caching.post_tags(
+        instance, getattr(instance, '_previous_group_slug', None)))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    caching.invalidate(*caching.post_tags(instance.post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    caching.invalidate(
+        caching.author_tag(instance.author.username),
+        caching.author_tag(instance.user.username),
+    )
+
+
+@receiver(pre_save, sender=Group)
+def group_before_save(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.invalidate_group(
+        instance, getattr(instance, '_previous_slug', None))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # После удаления посты уже без группы — сбрасываем, пока они в ней;
+    # invalidate повторит сброс после коммита.
+    caching.invalidate_group(instance)
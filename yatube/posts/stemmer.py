@@ -0,0 +1,134 @@
+"""Разбивка текста на слова и стемминг по алгоритму Snowball для русского.
+
+https://snowballstem.org/algorithms/russian/stemmer.html
+Латиница и числа не стеммятся, только приводятся к нижнему регистру.
+"""
+import re
+
+WORD_RE = re.compile(r'[^\W_]+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+VOWELS = set('аеиоуыэюя')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _regions(word):
+    """Начала областей RV и R2 (индексы в слове)."""
+    rv = r1 = r2 = len(word)
+    for index, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r2
+
+
+def _strip(rv, endings):
+    """Убирает самое длинное окончание из endings; None, если их нет."""
+    for ending in sorted(endings, key=len, reverse=True):
+        if rv.endswith(ending):
+            return rv[:-len(ending)]
+    return None
+
+
+def _strip_grouped(rv, groups):
+    """Как _strip, но окончания первой группы должны идти после а или я."""
+    first, second = groups
+    candidates = [
+        (ending, True) for ending in first
+    ] + [(ending, False) for ending in second]
+    for ending, after_a in sorted(
+            candidates, key=lambda item: len(item[0]), reverse=True):
+        if not rv.endswith(ending):
+            continue
+        stem = rv[:-len(ending)]
+        if after_a and not stem.endswith(('а', 'я')):
+            continue
+        return stem
+    return None
+
+
+def _step_1(rv):
+    stem = _strip_grouped(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    rv = _strip(rv, REFLEXIVE) or rv
+    stem = _strip(rv, ADJECTIVE)
+    if stem is not None:
+        return _strip_grouped(stem, PARTICIPLE) or stem
+    for remove in (lambda: _strip_grouped(rv, VERB),
+                   lambda: _strip(rv, NOUN)):
+        stem = remove()
+        if stem is not None:
+            return stem
+    return rv
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = _step_1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    r2_in_rv = max(r2_start - rv_start, 0)
+    if len(rv) > r2_in_rv:
+        shorter = _strip(rv[r2_in_rv:], DERIVATIONAL)
+        if shorter is not None:
+            rv = rv[:r2_in_rv] + shorter
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        shorter = _strip(rv, SUPERLATIVE)
+        if shorter is not None:
+            rv = shorter[:-1] if shorter.endswith('нн') else shorter
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, ё заменена на е."""
+    return [
+        word.replace('ё', 'е') for word in WORD_RE.findall(text.lower())]
+
+
+def terms(text):
+    """Основы слов текста для поискового индекса."""
+    return [stem(word) for word in tokenize(text)]
@@ -0,0 +1,71 @@
+"""Фоновые задачи постов (см. jobs.queue).
+
+Задачи получают id, а не объекты, и читают текущее состояние базы:
+к моменту выполнения пост могли изменить или удалить.
+"""
+from django.core.mail import send_mail
+from django.urls import reverse
+
+from jobs.queue import task
+
+from . import feed, search, thumbnails
+from .models import Comment, Follow, Post
+
+
+@task(atomic=True)
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'author_id', 'pub_date').first()
+    if post is not None:
+        feed.fan_out_post(post)
+
+
+@task(atomic=True)
+def sync_inbox(user_id, author_id):
+    """Приводит ленту подписчика к подписке, какой она стала: порядок,
+    в котором выполнятся задачи подписки и отписки, не важен."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        feed.add_author_to_inbox(user_id, author_id)
+    else:
+        feed.remove_author_from_inbox(user_id, author_id)
+
+
+@task()
+def backfill_author(author_id):
+    # Подписчиков может быть много: пачки коммитятся по отдельности,
+    # повтор пропускает уже разложенные посты.
+    feed.backfill_author(author_id)
+
+
+@task(atomic=True)
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'text').first()
+    if post is None:
+        search.remove_post(post_id)
+    else:
+        search.index_post(post)
+
+
+@task(max_attempts=3)
+def generate_thumbnail(post_id):
+    thumbnails.generate_thumbnail(post_id)
+
+
+@task()
+def notify_comment(comment_id):
+    """Письмо автору поста о новом комментарии."""
+    comment = Comment.objects.select_related(
+        'author', 'post__author').filter(pk=comment_id).first()
+    if comment is None:
+        return
+    recipient = comment.post.author
+    if recipient == comment.author or not recipient.email:
+        return
+    address = reverse(
+        'posts:post_detail', kwargs={'post_id': comment.post_id})
+    send_mail(
+        f'Новый комментарий от {comment.author.get_username()}',
+        f'{comment.text}\n\n{address}',
+        None,
+        [recipient.email],
+    )
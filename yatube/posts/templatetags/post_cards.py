@@ -0,0 +1,70 @@
+from hashlib import md5
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from posts import caching
+from posts.utils import comments_prefetch
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_forloop.html'
+CARD_PREFIX = 'post-card:'
+CARD_TIMEOUT = settings.CONSTANTS['PAGE_CACHE_TIMEOUT']
+
+
+def card_key(post, version, flags):
+    """Ключ карточки: версия тега поста и то, что меняется мимо него.
+
+    Версия сбрасывается при правке поста и его комментариев. Имя автора,
+    группа, миниатюра и счётчик комментариев (массовые действия
+    модерации) берутся из той же строки запроса, что и сам пост.
+    """
+    group = post.group
+    source = '|'.join(str(part) for part in (
+        sorted(flags.items()),
+        get_language(),
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+        group.title if group else '',
+        post.image.name,
+        post.thumbnail_url,
+        post.image_variants,
+        post.comment_count,
+    ))
+    digest = md5(source.encode()).hexdigest()
+    return f'{CARD_PREFIX}{post.pk}:{version}:{digest}'
+
+
+@register.simple_tag
+def post_cards(posts, **flags):
+    """Список HTML-карточек постов страницы: готовые — одним get_many
+    из кэша, остальные отрисовываются, причём комментарии загружаются
+    только для них."""
+    posts = list(posts)
+    versions = caching.tag_versions(
+        [caching.post_tag(post.pk) for post in posts])
+    keys = [
+        card_key(post, version, flags)
+        for post, version in zip(posts, versions)
+    ]
+    cached = cache.get_many(keys)
+    missing = [
+        (key, post) for key, post in zip(keys, posts) if key not in cached
+    ]
+    prefetch_related_objects(
+        [post for _, post in missing if post.comment_count],
+        comments_prefetch())
+    card = get_template(CARD_TEMPLATE)
+    rendered = {
+        key: card.render({'post': post, **flags}) for key, post in missing
+    }
+    cache.set_many(rendered, CARD_TIMEOUT)
+    cached.update(rendered)
+    return [mark_safe(cached[key]) for key in keys]
@@ -0,0 +1,40 @@
+from django import template
+
+from core import instrumentation
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 1320px) 100vw, 1280px'
+
+
+def _srcset(candidates):
+    return ', '.join(f'{url} {width}w' for url, width in candidates)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes=DEFAULT_SIZES, lazy=True):
+    """<picture> с вариантами картинки поста.
+
+    Пока варианты не готовы, показывает исходную картинку.
+    """
+    if not post.image:
+        return {'image': None}
+    instrumentation.record('thumbnails')
+    variants = post.variants
+    if not variants:
+        return {'image': {'src': post.image.url}}
+    sources = variants['sources']
+    return {
+        'image': {
+            'src': variants['src'],
+            # Последний источник — JPEG, он же srcset самого <img>.
+            'srcset': _srcset(sources[-1]['srcset']),
+            'sources': [
+                {'type': source['type'], 'srcset': _srcset(source['srcset'])}
+                for source in sources[:-1]
+            ],
+            'placeholder': variants.get('placeholder'),
+        },
+        'sizes': sizes,
+        'lazy': lazy,
+    }
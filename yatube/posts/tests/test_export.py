@@ -0,0 +1,114 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff'
+    b'!\xf9\x04\x00\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00'
+    b'\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    """Тестируем выгрузку: вьюху export_data и одноимённую команду."""
+    @classmethod
+    def setUpClass(cls):
+        """Создаем двух пользователей, группу, посты, комментарий
+        и подписку."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост, "в кавычках"',
+            image=SimpleUploadedFile('cover.gif', SMALL_GIF, 'image/gif'))
+        cls.other_post = Post.objects.create(
+            author=cls.reader, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.other_post, author=cls.author, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_view_streams_own_data(self):
+        """Вьюха отдаёт потоком zip только со своими данными
+        и картинками."""
+        response = self.client.get(
+            reverse('posts:export_data'), {'images': '1'})
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [
+            'groups.jsonl', 'posts.jsonl', 'comments.jsonl',
+            'follows.jsonl', 'images/cover.gif',
+        ])
+        posts = [
+            json.loads(line)
+            for line in archive.read('posts.jsonl').decode().splitlines()
+        ]
+        self.assertEqual(len(posts), 1)
+        self.assertEqual(posts[0]['text'], self.post.text)
+        self.assertEqual(posts[0]['group'], 'group')
+        self.assertEqual(archive.read('images/cover.gif'), SMALL_GIF)
+        self.assertIn(b'reader', archive.read('follows.jsonl'))
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:export_data'), {'format': 'xml'}
+            ).status_code,
+            400,
+        )
+        self.assertRedirects(
+            Client().get(reverse('posts:export_data')),
+            f'{reverse("users:login")}?next={reverse("posts:export_data")}')
+
+    def test_command_round_trip(self):
+        """Выгрузка в CSV загружается обратно через import_data."""
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output, ignore_errors=True)
+        call_command(
+            'export_data', output, format='csv', images=True,
+            stdout=StringIO())
+        self.assertTrue(os.path.exists(
+            os.path.join(output, 'images', 'cover.gif')))
+        before = list(Post.objects.order_by('id').values_list(
+            'id', 'text', 'author', 'group__slug', 'pub_date'))
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        call_command(
+            'import_data',
+            **{
+                kind: os.path.join(output, f'{kind}.csv')
+                for kind in ('groups', 'posts', 'comments', 'follows')
+            },
+            images=os.path.join(output, 'images'),
+            # Потоки пула не видят данных незакоммиченной транзакции теста.
+            thumbnail_workers=0,
+            stdout=StringIO(),
+        )
+        self.assertEqual(list(Post.objects.order_by('id').values_list(
+            'id', 'text', 'author', 'group__slug', 'pub_date')), before)
+        self.assertEqual(Comment.objects.get().text, 'Комментарий')
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
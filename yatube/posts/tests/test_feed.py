@@ -0,0 +1,130 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.conf import settings
+from django.urls import reverse
+
+from core.testing import run_on_commit
+from jobs.models import Job
+
+from .. import feed
+from ..models import FeedItem, Follow, Post, User
+
+
+class FeedInboxTests(TestCase):
+    """Тестируем материализованную ленту подписок."""
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора, подписчика и пост автора."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def test_follow_and_new_post_fill_inbox(self):
+        """Подписка добавляет старые посты, новый пост раскладывается
+        по лентам, отписка очищает ленту."""
+        with run_on_commit():
+            self.reader_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': self.author}))
+            new_post = Post.objects.create(
+                author=self.author, text='Новый пост')
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)),
+            {self.old_post.id, new_post.id}
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        with run_on_commit():
+            self.reader_client.get(reverse(
+                'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    def test_celebrity_posts_are_pulled(self):
+        """Посты авторов с большим числом подписчиков не раскладываются,
+        но попадают в ленту при чтении."""
+        constants = dict(settings.CONSTANTS, FEED_CELEBRITY_FOLLOWERS=1)
+        with override_settings(CONSTANTS=constants):
+            Follow.objects.create(user=self.reader, author=self.author)
+            cache.clear()
+            post = Post.objects.create(author=self.author, text='Для всех')
+            self.assertFalse(FeedItem.objects.filter(post=post).exists())
+            response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_celebrity_threshold_both_ways(self):
+        """Пока автор «звезда», его посты читаются запросом; когда он
+        опускается ниже порога, пропущенные посты и подписки «во время
+        славы» раскладываются по лентам — даже если кэш уже вытеснен."""
+        fans = [
+            User.objects.create_user(username=f'fan{number}')
+            for number in range(2)
+        ]
+        late_fan = User.objects.create_user(username='late_fan')
+        constants = dict(settings.CONSTANTS, FEED_CELEBRITY_FOLLOWERS=3)
+        with override_settings(CONSTANTS=constants):
+            with run_on_commit():
+                Follow.objects.create(user=self.reader, author=self.author)
+                Follow.objects.create(user=fans[0], author=self.author)
+            self.assertNotIn(self.author.id, feed.celebrity_ids())
+            with run_on_commit():
+                Follow.objects.create(user=fans[1], author=self.author)
+            self.assertIn(self.author.id, feed.celebrity_ids())
+            with run_on_commit():
+                post = Post.objects.create(author=self.author, text='Слава')
+                Follow.objects.create(user=late_fan, author=self.author)
+            self.assertFalse(FeedItem.objects.filter(post=post).exists())
+            self.assertFalse(
+                FeedItem.objects.filter(user=late_fan).exists())
+            response = self.reader_client.get(reverse('posts:follow_index'))
+            self.assertIn(post, response.context['page_obj'])
+            cache.clear()
+            with run_on_commit():
+                Follow.objects.filter(user__in=fans).delete()
+            self.assertNotIn(self.author.id, feed.celebrity_ids())
+            response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=late_fan).values_list(
+                'post_id', flat=True)),
+            {self.old_post.id, post.id},
+        )
+
+    def test_backfill_job_is_keyed(self):
+        """Раскладку после выхода из «звёзд» ставит отписка, с ключом;
+        чтение ленты задач не ставит."""
+        fan = User.objects.create_user(username='fan')
+        constants = dict(
+            settings.CONSTANTS, FEED_CELEBRITY_FOLLOWERS=2, JOBS_EAGER=0)
+        with override_settings(CONSTANTS=constants):
+            Follow.objects.create(user=self.reader, author=self.author)
+            follow = Follow.objects.create(user=fan, author=self.author)
+            follow_id = follow.pk
+            follow.delete()
+            for _ in range(2):
+                cache.clear()
+                self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(Job.objects.filter(
+                name='posts.tasks.backfill_author').values_list(
+                    'key', flat=True)),
+            [f'feed-backfill:{follow_id}'])
+
+    def test_backfill_command(self):
+        """Команда backfill_feed восстанавливает ленты из Follow."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('backfill_feed', stdout=StringIO())
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=self.old_post).exists())
@@ -1,12 +1,23 @@
 import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+
 from django.conf import settings
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
+from PIL import Image
 
+from core.testing import run_on_commit
+from posts import thumbnails
 from posts.forms import PostForm, CommentForm
+from posts.management.commands.warm_thumbnails import _unordered
 from posts.models import Post, Group, User, Comment
+from posts.thumbnails import generate_thumbnail
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -92,6 +103,51 @@ class PostCreateFormTests(TestCase):
             ).exists()
         )
 
+    def test_thumbnail_generated_after_create(self):
+        """После сохранения картинки миниатюра создаётся заранее,
+        и шаблоны берут её адрес из поста."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': SimpleUploadedFile(
+                name='thumb.gif', content=self.small_gif,
+                content_type='image/gif')},
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.thumbnail_url, '')
+        url = generate_thumbnail(post.id)
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_url, url)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, url)
+
+    def test_warm_thumbnails_command(self):
+        """Команда warm_thumbnails создаёт недостающие миниатюры."""
+        post = Post.objects.create(
+            author=self.user, text='Старый пост', image=SimpleUploadedFile(
+                name='old.gif', content=self.small_gif,
+                content_type='image/gif'))
+        call_command('warm_thumbnails', '--workers=0', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+
+    def test_warm_thumbnails_pool_is_bounded(self):
+        """С пулом warm_thumbnails берёт новые id по мере готовности,
+        а не ставит в очередь все сразу."""
+        taken = []
+
+        def post_ids():
+            for post_id in range(20):
+                taken.append(post_id)
+                yield post_id
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = _unordered(pool, abs, post_ids(), limit=4)
+            first = next(results)
+            self.assertLessEqual(len(taken), 5)
+            rest = list(results)
+        self.assertEqual(sorted([first, *rest]), list(range(20)))
+
     def test_edit_post_authorized(self):
         """Валидная форма редактирует запись в Post."""
         posts_count = Post.objects.count()
@@ -144,3 +200,48 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         self.assertEqual(Comment.objects.count(), comments_count)
+
+
+class ThumbnailPoolTests(TransactionTestCase):
+    """Миниатюры в фоновом пуле: потокам пула нужны закоммиченные
+    данные, поэтому без TestCase. Тесты сами дожидаются пула до
+    удаления временного MEDIA_ROOT."""
+    def setUp(self):
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.addCleanup(thumbnails.wait_for_thumbnails)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.user = User.objects.create_user(username='pool')
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def image(name, width):
+        buffer = BytesIO()
+        Image.new('RGB', (width, width // 2), (200, 10, 10)).save(
+            buffer, 'JPEG')
+        return SimpleUploadedFile(
+            name=name, content=buffer.getvalue(), content_type='image/jpeg')
+
+    def create(self, text, image):
+        with run_on_commit():
+            self.client.post(
+                reverse('posts:post_create'),
+                data={'text': text, 'image': image})
+        return Post.objects.get(text=text)
+
+    def test_small_image_inline(self):
+        """Картинка не шире самого узкого варианта нарезается сразу,
+        без пула."""
+        thumbnails.wait_for_thumbnails()
+        post = self.create('Маленькая', self.image('small.jpg', 100))
+        self.assertTrue(post.thumbnail_url)
+        self.assertIsNone(thumbnails._executor)
+
+    def test_large_image_in_pool(self):
+        """Большую картинку режет пул; ответ его не ждёт."""
+        post = self.create('Большая', self.image('large.jpg', 1000))
+        thumbnails.wait_for_thumbnails()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
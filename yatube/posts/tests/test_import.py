@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from ..bulk import indexes_dropped
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportDataTests(TestCase):
+    """Тестируем команду import_data."""
+    @classmethod
+    def setUpClass(cls):
+        """Готовим файлы выгрузки в CSV и JSONL и картинку."""
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.write(
+            'users.csv',
+            'username,first_name,last_name\n'
+            'leo,Лев,Толстой\nfyodor,Фёдор,Достоевский\n')
+        cls.write(
+            'groups.jsonl',
+            json.dumps({'slug': 'classics', 'title': 'Классика'}) + '\n')
+        cls.write('posts.jsonl', ''.join(json.dumps(row) + '\n' for row in (
+            {'id': 10, 'text': 'Война и мир', 'author': 'leo',
+             'group': 'classics', 'pub_date': '1869-01-01T00:00:00',
+             'image': 'cover.gif'},
+            {'id': 11, 'text': 'Бесы', 'author': 'fyodor'},
+            {'id': 12, 'text': 'Чужой пост', 'author': 'nobody'},
+        )))
+        cls.write(
+            'comments.csv',
+            'post,author,text\n10,fyodor,Длинно\n99,leo,Мимо\n')
+        cls.write('follows.csv', 'user,author\nfyodor,leo\nfyodor,leo\n')
+        with open(os.path.join(cls.source, 'cover.gif'), 'wb') as file:
+            file.write(
+                b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff'
+                b'!\xf9\x04\x00\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00'
+                b'\x01\x00\x00\x02\x02D\x01\x00;')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def write(cls, name, content):
+        with open(os.path.join(cls.source, name), 'w',
+                  encoding='utf-8') as file:
+            file.write(content)
+
+    def path(self, name):
+        return os.path.join(self.source, name)
+
+    def test_import(self):
+        """Данные загружаются со связями, датами и картинками, строки
+        с неизвестными ссылками и повторы пропускаются, счётчики
+        пересчитываются."""
+        stderr = StringIO()
+        call_command(
+            'import_data',
+            users=self.path('users.csv'),
+            groups=self.path('groups.jsonl'),
+            posts=self.path('posts.jsonl'),
+            comments=self.path('comments.csv'),
+            follows=self.path('follows.csv'),
+            images=self.source,
+            batch_size=1,
+            thumbnail_workers=0,
+            stdout=StringIO(),
+            stderr=stderr,
+        )
+        self.assertEqual(User.objects.count(), 2)
+        self.assertFalse(
+            User.objects.get(username='leo').has_usable_password())
+        post = Post.objects.get(id=10)
+        self.assertEqual(post.group, Group.objects.get(slug='classics'))
+        self.assertEqual(post.pub_date.year, 1869)
+        self.assertEqual(post.image.name, 'posts/cover.gif')
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertTrue(post.thumbnail_url)
+        self.assertFalse(Post.objects.get(id=11).thumbnail_url)
+        self.assertEqual(post.comment_count, 1)
+        self.assertFalse(Post.objects.filter(id=12).exists())
+        self.assertEqual(Comment.objects.get().author.username, 'fyodor')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserCounters.objects.get(user__username='leo').followers_count, 1)
+        self.assertIn('2', stderr.getvalue())
+
+
+class IndexesDroppedTests(TransactionTestCase):
+    """Тестируем удаление индексов на время загрузки: схему в SQLite
+    внутри транзакции не поменять, поэтому без TestCase."""
+    models = (Post, Comment)
+
+    def present(self):
+        """Имена индексов из Meta.indexes, которые есть в базе."""
+        names = set()
+        with connection.cursor() as cursor:
+            for model in self.models:
+                names.update(connection.introspection.get_constraints(
+                    cursor, model._meta.db_table))
+        return {
+            index.name for model in self.models
+            for index in model._meta.indexes
+        } & names
+
+    def test_dropped_and_rebuilt(self):
+        """Индексы удаляются внутри блока и строятся заново, в том числе
+        после ошибки."""
+        expected = self.present()
+        self.assertTrue(expected)
+        with indexes_dropped(*self.models) as dropped:
+            self.assertTrue(dropped)
+            self.assertEqual(self.present(), set())
+        self.assertEqual(self.present(), expected)
+        with self.assertRaises(ValueError), indexes_dropped(*self.models):
+            raise ValueError
+        self.assertEqual(self.present(), expected)
+
+    def test_failed_import_rebuilds_indexes(self):
+        """Упавшая загрузка оставляет индексы на месте."""
+        expected = self.present()
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, ignore_errors=True)
+        path = os.path.join(source, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"text": "Без автора"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_data', posts=path, stdout=StringIO())
+        self.assertEqual(self.present(), expected)
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
 
-from ..models import Group, Post, User, Comment, Follow
+from ..models import Group, Post, User, Comment, Follow, UserCounters
 
 
 User = get_user_model()
@@ -124,3 +129,75 @@ class PostModelTest(TestCase):
         comment = PostModelTest.comment
         help_text = comment._meta.get_field('text').help_text
         self.assertEqual(help_text, 'Текст комментария')
+
+
+class CountersTest(TestCase):
+    """Тестируем денормализованные счётчики."""
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора, читателя и пост с комментарием."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+
+    def assert_counters(self, user, posts, followers, following):
+        counters = UserCounters.objects.get(user=user)
+        self.assertEqual(
+            (
+                counters.posts_count,
+                counters.followers_count,
+                counters.following_count,
+            ),
+            (posts, followers, following)
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении постов,
+        комментариев и подписок."""
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assert_counters(self.author, 1, 0, 0)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assert_counters(self.author, 1, 1, 0)
+        self.assert_counters(self.reader, 0, 0, 1)
+        follow.delete()
+        Post.objects.filter(author=self.author).delete()
+        self.assert_counters(self.author, 0, 0, 0)
+        self.assert_counters(self.reader, 0, 0, 0)
+
+    def test_repair_counters_command(self):
+        """Команда repair_counters восстанавливает испорченные счётчики."""
+        UserCounters.objects.all().delete()
+        Post.objects.update(comment_count=0)
+        call_command('repair_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assert_counters(self.author, 1, 0, 0)
+
+    def test_counters_do_not_go_negative(self):
+        """Удаление при разошедшихся в ноль счётчиках их не ломает."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounters.objects.update(
+            posts_count=0, followers_count=0, following_count=0)
+        Post.objects.update(comment_count=0)
+        Comment.objects.all().delete()
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        self.assert_counters(self.author, 0, 0, 0)
+        self.assert_counters(self.reader, 0, 0, 0)
+
+    def test_pages_without_counters_row(self):
+        """Профиль и пост открываются, если строки счётчиков ещё нет."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounters.objects.all().delete()
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'auth'}))
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertContains(response, 'Подписчиков: 1')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, 'Всего постов автора: 1')
+        self.assertFalse(UserCounters.objects.exists())
@@ -0,0 +1,133 @@
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import run_on_commit
+
+from .. import caching
+from ..bulk import id_chunks
+from ..models import (
+    Comment, FeedItem, Follow, Group, Post, SearchTerm, User, UserCounters)
+from ..search import search
+
+CHANGELIST = reverse('admin:posts_post_changelist')
+
+
+class ModerationTests(TestCase):
+    """Тестируем массовые действия модерации в админке."""
+    @classmethod
+    def setUpTestData(cls):
+        with run_on_commit():
+            cls.admin = User.objects.create_superuser(
+                'admin', 'admin@example.com', 'password')
+            cls.spammer = User.objects.create_user(username='spammer')
+            cls.author = User.objects.create_user(username='author')
+            cls.old_group = Group.objects.create(title='Старая', slug='old')
+            cls.new_group = Group.objects.create(title='Новая', slug='new')
+            Follow.objects.create(user=cls.author, author=cls.spammer)
+            cls.spam = [
+                Post.objects.create(
+                    author=cls.spammer, group=cls.old_group,
+                    text=f'Купите слона {number}')
+                for number in range(5)
+            ]
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.old_group, text='Обычный пост')
+            for post in cls.spam[:2]:
+                Comment.objects.create(
+                    post=post, author=cls.author, text='Это спам')
+            Comment.objects.create(
+                post=cls.post, author=cls.spammer, text='Купите слона')
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text='Сам купи')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def act(self, action, posts, **data):
+        return self.client.post(CHANGELIST, {
+            'action': action,
+            'index': 0,
+            ACTION_CHECKBOX_NAME: [post.id for post in posts],
+            **data,
+        })
+
+    def confirm(self, action, posts):
+        return self.client.post(CHANGELIST, {
+            'action': action,
+            'post': 'yes',
+            ACTION_CHECKBOX_NAME: [post.id for post in posts],
+        })
+
+    def test_move_to_group(self):
+        """Перенос одним UPDATE сбрасывает кэш обеих групп."""
+        versions = caching.tag_versions(
+            [caching.group_tag('old'), caching.group_tag('new')])
+        self.act('move_to_group', self.spam[:3], group=self.new_group.id)
+        self.assertEqual(self.new_group.posts.count(), 3)
+        self.assertNotEqual(
+            caching.tag_versions(
+                [caching.group_tag('old'), caching.group_tag('new')]),
+            versions)
+        self.act('move_to_group', self.spam[:1], group='')
+        self.assertIsNone(Post.objects.get(id=self.spam[0].id).group)
+
+    def test_purge_comments(self):
+        """Сначала подтверждение, потом удаление и обнуление счётчика."""
+        response = self.act('purge_comments', [self.post])
+        self.assertTemplateUsed(
+            response, 'admin/posts/post/bulk_action_confirmation.html')
+        self.assertEqual(self.post.comments.count(), 2)
+        self.confirm('purge_comments', [self.post])
+        self.assertEqual(self.post.comments.count(), 0)
+        self.assertEqual(
+            Post.objects.get(id=self.post.id).comment_count, 0)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_delete_authors_spam(self):
+        """Удаляются посты, комментарии, ленты и индекс; счётчики верны."""
+        response = self.act('delete_authors_spam', self.spam[:1])
+        self.assertContains(response, 'spammer (постов: 5)')
+        with CaptureQueriesContext(connection) as queries:
+            self.confirm('delete_authors_spam', self.spam[:1])
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(
+            Comment.objects.filter(author=self.spammer).exists())
+        self.assertFalse(FeedItem.objects.filter(user=self.author).exists())
+        self.assertFalse(
+            SearchTerm.objects.filter(post__author=self.spammer).exists())
+        self.assertEqual(search('слон').count(), 0)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.spammer).posts_count, 0)
+        self.assertEqual(Post.objects.get(id=self.post.id).comment_count, 1)
+        # Комментарии удаляются без загрузки в память.
+        self.assertFalse(any(
+            '"posts_comment"."text"' in query['sql']
+            for query in queries.captured_queries))
+
+    def test_delete_posts_in_chunks(self):
+        """Выборка целиком (select_across) обходится пачками."""
+        queryset = Post.objects.filter(author=self.spammer)
+        self.assertEqual(
+            list(id_chunks(queryset, size=2)),
+            [[post.id for post in self.spam[i:i + 2]] for i in (0, 2, 4)])
+        self.client.post(CHANGELIST + '?q=слона', {
+            'action': 'delete_posts',
+            'post': 'yes',
+            'select_across': 1,
+            ACTION_CHECKBOX_NAME: [self.spam[0].id],
+        })
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertEqual(
+            UserCounters.objects.get(user=self.spammer).posts_count, 0)
+
+    def test_default_delete_replaced(self):
+        response = self.client.get(CHANGELIST)
+        actions = dict(response.context['action_form'].fields[
+            'action'].choices)
+        self.assertNotIn('delete_selected', actions)
+        self.assertIn('delete_posts', actions)
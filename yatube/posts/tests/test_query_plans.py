@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.testing import QueryPlanMixin
+
+from ..feed import FEED_ORDERING, feed_posts
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import (
+    CURSOR_ORDERING, CursorPaginator, feed_queryset, post_detail_queryset)
+
+
+class QueryPlansTest(QueryPlanMixin, TestCase):
+    """Каждая лента и страница поста читается по индексу, без полного
+    чтения таблицы и без сортировки всех подходящих строк."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        per_page = settings.CONSTANTS['POSTS_PER_PAGE']
+        for number in range(per_page * 2 + 1):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {number}')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+
+    def assertIndexedPages(self, posts, ordering=CURSOR_ORDERING):
+        """Первая страница, следующая и возврат назад по курсорам."""
+        paginator = CursorPaginator(
+            feed_queryset(posts), settings.CONSTANTS['POSTS_PER_PAGE'],
+            ordering)
+        with CaptureQueriesContext(connection) as queries:
+            first = paginator.cursor_page('')
+            second = paginator.cursor_page(first.next_cursor)
+            paginator.cursor_page(second.previous_cursor)
+        self.assertIndexedQueries(queries.captured_queries)
+
+    def test_index(self):
+        self.assertIndexedPages(Post.objects.all())
+
+    def test_group_posts(self):
+        self.assertIndexedPages(self.group.posts.all())
+
+    def test_profile(self):
+        self.assertIndexedPages(self.author.posts.all())
+
+    def test_follow_index(self):
+        self.assertIndexedPages(feed_posts(self.reader), FEED_ORDERING)
+
+    def test_post_detail(self):
+        with CaptureQueriesContext(connection) as queries:
+            post_detail_queryset().get(id=self.post.id)
+        self.assertIndexedQueries(queries.captured_queries)
+
+    def test_helper_catches_sort(self):
+        """Помощник ловит сортировку по неиндексированному полю."""
+        with self.assertRaises(AssertionError):
+            self.assertIndexedPlan(Post.objects.order_by('text'))
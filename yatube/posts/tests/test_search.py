@@ -0,0 +1,168 @@
+from io import StringIO
+from unittest import skipUnless
+from urllib.parse import urlencode
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import run_on_commit
+
+from ..models import Post, SearchTerm, User
+from ..search import fts5_supported, get_backend, matching_post_ids, search
+from ..stemmer import stem, terms
+
+
+class StemmerTests(TestCase):
+    """Тестируем разбивку на слова и стемминг."""
+    def test_inflected_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        for forms in (
+            ('кошка', 'кошки', 'кошкой', 'кошку'),
+            ('бежать', 'бежал', 'бежала'),
+            ('красивый', 'красивая', 'красивыми'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_terms(self):
+        """Регистр, ё, латиница, числа и знаки препинания."""
+        self.assertEqual(
+            terms('Ёжик, Django_2 и ЛЕС!'),
+            ['ежик', 'django', '2', 'и', 'лес'])
+
+
+class SearchBackendMixin:
+    """Общие проверки для обоих бэкендов индекса."""
+    backend = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.settings_override = override_settings(SEARCH_BACKEND=cls.backend)
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        with run_on_commit():
+            cls.cats = Post.objects.create(
+                author=cls.user, text='Кошки гуляют сами по себе. Кошки!')
+            cls.cat = Post.objects.create(
+                author=cls.user, text='Про кошку и собаку')
+            cls.dogs = Post.objects.create(
+                author=cls.user, text='Собаки охраняют дом')
+
+    def found(self, query):
+        return [post.id for post in search(query)[:]]
+
+    def test_backend(self):
+        self.assertEqual(
+            type(get_backend()).__name__,
+            {'fts5': 'FTS5Backend', 'inverted': 'InvertedIndexBackend'}[
+                self.backend])
+
+    def test_inflected_forms_found(self):
+        """Запрос в другой форме находит пост, ранжирование по частоте."""
+        self.assertEqual(self.found('кошками'), [self.cats.id, self.cat.id])
+        # При равной частоте выше более короткий и более новый пост.
+        self.assertEqual(self.found('собака'), [self.dogs.id, self.cat.id])
+
+    def test_all_words_required(self):
+        """Находятся только посты со всеми словами запроса."""
+        self.assertEqual(self.found('кошка собака'), [self.cat.id])
+        self.assertEqual(self.found('кошка слон'), [])
+        self.assertEqual(self.found('  '), [])
+        self.assertEqual(search('кошка').count(), 2)
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        with run_on_commit():
+            post = Post.objects.create(author=self.user, text='Жираф')
+        self.assertEqual(self.found('жирафы'), [post.id])
+        post.text = 'Слон'
+        with run_on_commit():
+            post.save()
+        self.assertEqual(self.found('жираф'), [])
+        self.assertEqual(self.found('слоны'), [post.id])
+        post.delete()
+        self.assertEqual(self.found('слон'), [])
+
+    def test_reindex_command(self):
+        """Команда пересобирает индекс целиком."""
+        get_backend().clear()
+        self.assertEqual(self.found('кошка'), [])
+        out = StringIO()
+        call_command('reindex_search', '--batch-size=2', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.found('кошка'), [self.cats.id, self.cat.id])
+
+    def test_matching_post_ids(self):
+        """Подзапрос для filter(id__in=...)."""
+        self.assertQuerysetEqual(
+            Post.objects.filter(
+                id__in=matching_post_ids('собаки')).order_by('id'),
+            [self.cat.id, self.dogs.id], transform=lambda post: post.id)
+
+
+class InvertedIndexSearchTests(SearchBackendMixin, TestCase):
+    backend = 'inverted'
+
+    def test_terms_stored_once_per_post(self):
+        """Повторы слова дают одну строку с большим весом."""
+        rows = SearchTerm.objects.filter(term=stem('кошки'))
+        self.assertEqual(rows.count(), 2)
+        self.assertGreater(
+            rows.get(post=self.cats).weight, rows.get(post=self.cat).weight)
+
+
+@skipUnless(
+    connection.vendor == 'sqlite' and fts5_supported(), 'нужен SQLite с FTS5')
+class FTS5SearchTests(SearchBackendMixin, TestCase):
+    backend = 'fts5'
+
+
+class SearchViewTests(TestCase):
+    """Тестируем страницу поиска и поиск в админке."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Заметка про реку номер {number}')
+            for number in range(15)
+        ] + [Post(author=cls.user, text='Про горы')])
+        # bulk_create не шлёт сигналы — индекс строим командой.
+        call_command('reindex_search', stdout=StringIO())
+
+    def test_search_page(self):
+        """Выдача разбита на страницы, ссылки сохраняют запрос."""
+        response = Client().get(reverse('posts:search'), {'q': 'реки'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 15)
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(
+            response, f'href="?{urlencode({"q": "реки"})}&amp;page=2"')
+        response = Client().get(
+            reverse('posts:search'), {'q': 'реки', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_empty_query(self):
+        response = Client().get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по индексу и понимает словоформы."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'горами'})
+        self.assertEqual(response.context['cl'].result_count, 1)
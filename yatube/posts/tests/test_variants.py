@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, User
+from ..thumbnails import generate_thumbnail
+from ..variants import VARIANTS_DIR, build_variants, output_formats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(size=(1200, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        'big.png', buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    """Тестируем адаптивные варианты картинки поста."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с большой картинкой', image=png())
+
+    def test_variants_named_by_content(self):
+        """Варианты не шире исходника, названы по хэшу содержимого
+        и не пересоздаются для той же картинки."""
+        variants = build_variants(self.post.image)
+        self.assertEqual(len(variants['sources']), len(output_formats()))
+        jpeg = variants['sources'][-1]
+        self.assertEqual(jpeg['type'], 'image/jpeg')
+        self.assertEqual([width for _, width in jpeg['srcset']], [480, 960])
+        self.assertEqual(variants['src'], jpeg['srcset'][1][0])
+        self.assertTrue(
+            variants['placeholder'].startswith('data:image/jpeg;base64,'))
+        folder = os.path.join(TEMP_MEDIA_ROOT, VARIANTS_DIR)
+        files = sorted(
+            name for _, _, names in os.walk(folder) for name in names)
+        other = Post.objects.create(
+            author=self.user, text='Та же картинка', image=png())
+        self.assertEqual(build_variants(other.image), variants)
+        self.assertEqual(sorted(
+            name for _, _, names in os.walk(folder) for name in names), files)
+        with Image.open(os.path.join(
+                TEMP_MEDIA_ROOT, jpeg['srcset'][0][0][len('/media/'):])) as im:
+            self.assertEqual(im.size, (480, 170))
+
+    def test_templates_render_srcset(self):
+        """После генерации страницы отдают <picture> со srcset."""
+        generate_thumbnail(self.post.id)
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, ' 480w, ')
+        self.assertContains(response, ' 960w"')
+        self.assertNotContains(response, 'loading="lazy"')
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
@@ -1,14 +1,22 @@
 import shutil
 import tempfile
+import threading
+from unittest import mock
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django import forms
 
-from ..models import Group, Post, User, Follow
+from core.testing import run_on_commit
+
+from .. import caching
+from ..models import Comment, Group, Post, User, Follow
 
 User = get_user_model()
 
@@ -54,10 +62,11 @@ class PostPagesTests(TestCase):
             group=cls.group,
             image=cls.uploaded
         )
-        cls.follower = Follow.objects.create(
-            user=cls.user_not_author,
-            author=cls.user
-        )
+        with run_on_commit():
+            cls.follower = Follow.objects.create(
+                user=cls.user_not_author,
+                author=cls.user
+            )
 
     @classmethod
     def tearDownClass(cls):
@@ -191,18 +200,127 @@ class PostPagesTests(TestCase):
         self.post_assert_method_form(response)
 
     def test_index_page_cache(self):
-        """Проверка кэширования страницы index."""
+        """Проверка кэширования страницы index: повторный запрос берётся
+        из кэша, новый пост сбрасывает кэш сразу."""
         response = self.authorized_client.get(reverse('posts:index'))
         page_content = response.content
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(page_content, response.content)
         Post.objects.create(
             text='Ещё один тестовый текст',
             author=self.user
         )
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(page_content, response.content)
-        cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(page_content, response.content)
+        self.assertContains(response, 'Ещё один тестовый текст')
+
+    def test_pages_cache_invalidated_by_events(self):
+        """Комментарий, подписка и правка группы сбрасывают кэш
+        соответствующих страниц."""
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user.username})
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug})
+        for url in (post_url, profile_url, group_url):
+            self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user_not_author, text='Свежий ответ')
+        self.assertContains(self.guest_client.get(post_url), 'Свежий ответ')
+        self.assertContains(self.guest_client.get(group_url), 'Свежий ответ')
+        Follow.objects.create(user=self.user_not_follower, author=self.user)
+        self.assertContains(
+            self.guest_client.get(profile_url), 'Подписчиков: 2')
+        self.group.description = 'Новое описание'
+        self.group.save()
+        self.assertContains(
+            self.guest_client.get(group_url), 'Новое описание')
+
+    def test_group_rename_invalidates_post_and_profile(self):
+        """Переименование группы сбрасывает страницы поста и профиля
+        с её названием и ссылкой, их ETag тоже меняется."""
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user.username})
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in (post_url, profile_url)
+        }
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Переименованная группа'
+        group.slug = 'renamed-group'
+        group.save()
+        new_group_url = reverse(
+            'posts:group_list', kwargs={'slug': 'renamed-group'})
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Переименованная группа')
+                self.assertContains(response, new_group_url)
+
+    def test_stale_page_served_while_another_worker_rebuilds(self):
+        """Пока страницу пересобирает другой воркер, отдаётся
+        устаревшая копия; счётчики кэша это учитывают."""
+        url = reverse('posts:index')
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'HIT')
+        Post.objects.create(text='Пост во время пересборки', author=self.user)
+        with mock.patch.object(caching.cache, 'add', return_value=False):
+            response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertNotContains(response, 'Пост во время пересборки')
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Пост во время пересборки')
+        self.assertEqual(
+            caching.page_cache_stats(), {'hit': 1, 'miss': 2, 'stale': 1})
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница — 304 без запросов к базе; у гостя и
+        вошедшего пользователя разные ETag."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.guest_client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+
+    @override_settings(DATABASE_REPLICA_LAG=0.2)
+    def test_delayed_bumps_share_one_thread(self):
+        """Отложенные сбросы выполняет один поток, повторные сбросы
+        тега до срока схлопываются."""
+        bumped = []
+        done = threading.Event()
+
+        def bump(tags):
+            bumped.extend(tags)
+            if len(bumped) >= 2:
+                done.set()
+
+        with mock.patch.object(caching, '_bump', side_effect=bump):
+            for _ in range(3):
+                caching._bump_later(['posts', 'post:1'])
+            caching._bump_later(['post:1'])
+            self.assertEqual(
+                [thread.name for thread in threading.enumerate()].count(
+                    'cache-delayed-bumps'), 1)
+            self.assertTrue(done.wait(5))
+        self.assertEqual(sorted(bumped), ['post:1', 'posts'])
 
     def test_profile_follower_authorized(self):
         """Проверка функции подписки/удаления подписки
@@ -220,10 +338,11 @@ class PostPagesTests(TestCase):
     def test_follow_index_page_content(self):
         """Проверка, что новая запись автора появляется у
         подписчиков и не появляется в ленте тех, кто не подписан."""
-        Post.objects.create(
-            text='Новый пост автора',
-            author=self.user
-        )
+        with run_on_commit():
+            Post.objects.create(
+                text='Новый пост автора',
+                author=self.user
+            )
         response_follower = self.authorized_client_2.get(
             reverse('posts:follow_index')
         )
@@ -289,3 +408,149 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(reverse_name=reverse_name):
                 response = self.guest_client.get(reverse_name)
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Проверка: курсорная пагинация листает вперёд и назад
+        без пропусков и повторов."""
+        url = reverse('posts:index')
+        first_page = self.guest_client.get(url).context['page_obj']
+        response = self.guest_client.get(
+            url, {'cursor': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        ids = [post.id for post in first_page] + [
+            post.id for post in second_page]
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True))
+        )
+        response = self.guest_client.get(
+            url, {'cursor': second_page.previous_cursor})
+        back_page = response.context['page_obj']
+        self.assertEqual(
+            [post.id for post in back_page], [post.id for post in first_page])
+        self.assertFalse(back_page.has_previous())
+
+    def test_cursor_page_skips_count_query(self):
+        """Проверка: курсорная страница обходится без COUNT(*)."""
+        url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug})
+        first_page = self.guest_client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'cursor': first_page.next_cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Проверка: битый курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        # Не ASCII: base64 падает с ValueError, а не binascii.Error.
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'привет'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class FeedQueriesTest(TestCase):
+    """Тестируем число SQL-запросов на страницах со списком постов."""
+    @classmethod
+    def setUpClass(cls):
+        """Создаем посты с группой и комментариями разных авторов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='noname')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-groupname-slug',
+            description='Тестовое описание',
+        )
+        for i in range(12):
+            post = Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост №{i}.',
+                group=cls.group)
+            for j in range(3):
+                commentator = User.objects.create_user(
+                    username=f'commentator_{i}_{j}')
+                Comment.objects.create(
+                    post=post, author=commentator, text='Комментарий')
+        cls.reader = User.objects.create_user(username='reader')
+        with run_on_commit():
+            Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def test_list_pages_query_count(self):
+        """Число запросов не зависит от числа постов и комментариев."""
+        pages_queries = {
+            reverse('posts:index'): 3,
+            reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}): 4,
+            reverse(
+                'posts:profile', kwargs={'username': self.user.username}): 4,
+        }
+        for address, queries in pages_queries.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    response = self.guest_client.get(address)
+                self.assertContains(response, 'commentator_11_0')
+
+    def test_follow_index_query_count(self):
+        """Лента подписок тоже собирается постоянным числом запросов."""
+        address = reverse('posts:follow_index')
+        # Сессия, пользователь, «звёзды», счётчик для пагинатора, посты
+        # из ленты и комментарии к ним.
+        with self.assertNumQueries(6):
+            response = self.reader_client.get(address)
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, 'commentator_11_0')
+
+    def test_post_cards_cached(self):
+        """Готовые карточки берутся из кэша, и комментарии к ним не
+        загружаются; смена имени автора или комментатора обновляет
+        карточки."""
+        address = reverse('posts:index')
+        self.guest_client.get(address)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        # Счётчик для пагинатора и сами посты, без комментариев.
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(address)
+        self.assertContains(response, 'Свежий пост')
+        self.assertContains(response, 'commentator_11_0')
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        self.assertContains(
+            self.guest_client.get(address), 'Новое Имя', count=10)
+        group_address = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(group_address)
+        commentator = User.objects.get(username='commentator_11_0')
+        commentator.username = 'renamed_commentator'
+        commentator.save()
+        for page in (address, group_address):
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertContains(response, 'renamed_commentator')
+                self.assertNotContains(response, 'commentator_11_0')
+
+    def test_post_detail_query_count(self):
+        """Страница поста загружается двумя запросами (плюс поиск автора
+        для ключа кэша), даже если у нескольких постов совпадает текст."""
+        twin = Post.objects.create(author=self.user, text='Тестовый пост №0.')
+        address = reverse('posts:post_detail', kwargs={'post_id': twin.id})
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(address)
+        self.assertEqual(response.context['post'], twin)
+        self.assertEqual(
+            response.context['posts_count'],
+            Post.objects.filter(author=self.user).count()
+        )
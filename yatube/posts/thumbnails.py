@@ -0,0 +1,105 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from jobs import queue
+
+from . import caching
+from .models import Post
+from .variants import WIDTHS, build_variants
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CONSTANTS['THUMBNAIL_WORKERS'],
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def wait_for_thumbnails():
+    """Дожидается миниатюр, поставленных в пул, и закрывает его.
+
+    Тесты, которые отдают картинку пулу, вызывают её перед удалением
+    временного MEDIA_ROOT, иначе поток пула пишет в удаляемый каталог.
+    Следующая миниатюра создаст пул заново.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def generate_thumbnail(post_id):
+    """Создаёт варианты картинки и запоминает их в посте.
+
+    Возвращает адрес варианта по умолчанию.
+    """
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id).first()
+    if post is None or not post.image:
+        return None
+    variants = build_variants(post.image)
+    # Условие по image защищает от гонки: если картинку успели заменить,
+    # эту миниатюру записывать нельзя.
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail_url=variants['src'],
+        image_variants=json.dumps(variants),
+    )
+    caching.invalidate(*caching.post_tags(post))
+    return variants['src']
+
+
+def _generate_in_worker(post_id):
+    close_old_connections()
+    try:
+        generate_thumbnail(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def _fits_inline(post):
+    """Картинка не шире самого узкого варианта: нарезка — один вариант
+    на формат за пару миллисекунд, дешевле передачи в пул."""
+    try:
+        width = post.image.width
+    except (OSError, ValueError):
+        return False
+    return width is not None and width <= WIDTHS[0]
+
+
+def schedule_thumbnail(post):
+    """Ставит миниатюру в очередь фонового пула после коммита.
+
+    При THUMBNAIL_WORKERS = 0, а также для маленьких картинок миниатюра
+    создаётся сразу после коммита в том же потоке. С очередью задач
+    (JOBS_EAGER = 0) её создаёт воркер run_jobs.
+    """
+    if not queue.eager():
+        # tasks импортирует этот модуль.
+        from .tasks import generate_thumbnail as thumbnail_task
+        queue.enqueue(
+            thumbnail_task,
+            key=f'thumbnail:{post.pk}:{post.image.name}',
+            post_id=post.pk,
+        )
+        return
+
+    def submit():
+        if (settings.CONSTANTS['THUMBNAIL_WORKERS']
+                and not _fits_inline(post)):
+            _get_executor().submit(_generate_in_worker, post.pk)
+        else:
+            generate_thumbnail(post.pk)
+    transaction.on_commit(submit)
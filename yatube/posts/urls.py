@@ -6,6 +6,7 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path(
         'profile/<str:username>/follow/',
@@ -23,5 +24,6 @@ urlpatterns = [
     ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
-    path('create/', views.post_create, name='post_create')
+    path('create/', views.post_create, name='post_create'),
+    path('export/', views.export_data, name='export_data'),
 ]
@@ -1,8 +1,173 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
 from django.conf import settings
+from django.db.models import Prefetch, Q
+
+from .models import Comment, Post
+
+CURSOR_PARAM = 'cursor'
+CURSOR_ORDERING = ('-pub_date', '-id')
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def _reverse(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _cursor_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: знает только соседей, но не номер."""
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return ''
+        return self.paginator.encode(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return ''
+        return self.paginator.encode(self.object_list[0], PREVIOUS)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор: без COUNT(*) и без OFFSET.
+
+    ordering — поля в одном направлении, последнее уникально; по
+    умолчанию (-pub_date, -id). Поля могут быть и аннотациями: лента
+    подписок сортируется по полям своей таблицы. Строки — объекты
+    моделей или словари из values().
+    """
+    def __init__(self, object_list, per_page, ordering=CURSOR_ORDERING):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def position(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def encode(self, row, direction):
+        """Упаковывает позицию строки в непрозрачную строку."""
+        raw = '|'.join(
+            [direction] + [_cursor_value(v) for v in self.position(row)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _output_field(self, name):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def decode(self, token):
+        """Возвращает (direction, значения полей) или None для битого."""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            direction, *values = raw.decode().split('|')
+            values = [
+                self._output_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, ValidationError):
+            return None
+        if (direction not in (NEXT, PREVIOUS)
+                or len(values) != len(self.fields) or None in values):
+            return None
+        return direction, values
+
+    def _after(self, lookup, values):
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:index], values[:index]))
+            condition |= Q(**equal, **{f'{field}__{lookup}': values[index]})
+        return condition
+
+    def cursor_page(self, token):
+        position = self.decode(token) if token else None
+        if position is None:
+            rows = list(self.object_list[:self.per_page + 1])
+            return CursorPage(
+                rows[:self.per_page], self,
+                has_next=len(rows) > self.per_page, has_previous=False
+            )
+        direction, values = position
+        forward = 'lt' if self.descending else 'gt'
+        backward = 'gt' if self.descending else 'lt'
+        if direction == NEXT:
+            queryset = self.object_list.filter(self._after(forward, values))
+        else:
+            queryset = self.object_list.filter(
+                self._after(backward, values)
+            ).order_by(*(_reverse(field) for field in self.ordering))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            return CursorPage(rows, self, has_next=has_more, has_previous=True)
+        rows.reverse()
+        return CursorPage(rows, self, has_next=True, has_previous=has_more)
+
+
+def comments_prefetch():
+    return Prefetch(
+        'comments',
+        # post_id первым: так весь IN-список читается из индекса
+        # (post, created, id) без сортировки; внутри поста порядок тот же.
+        queryset=Comment.objects.select_related('author').order_by(
+            'post_id', 'created', 'id')
+    )
+
+
+def feed_queryset(post_list):
+    """Посты с автором и группой для карточек. Комментарии догружает
+    тег post_cards — только для карточек, которых нет в кэше."""
+    return post_list.select_related('author', 'group')
+
+
+def post_detail_queryset():
+    """Пост с автором, его счётчиками, группой и комментариями:
+    один запрос на пост и один на комментарии."""
+    return Post.objects.select_related(
+        'author__counters', 'group'
+    ).prefetch_related(comments_prefetch())
 
 
-def posts_paginator(request, post_list):
-    paginator = Paginator(post_list, settings.CONSTANTS['POSTS_PER_PAGE'])
+def posts_paginator(request, post_list, ordering=CURSOR_ORDERING):
+    per_page = settings.CONSTANTS['POSTS_PER_PAGE']
+    cursors = CursorPaginator(post_list, per_page, ordering)
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor is not None:
+        return cursors.cursor_page(cursor)
+    paginator = Paginator(post_list.order_by(*ordering), per_page)
     page_number = request.GET.get("page")
-    return paginator.get_page(page_number)
+    page = paginator.get_page(page_number)
+    # Ссылки «вперёд/назад» и с обычной страницы ведут на курсорный режим,
+    # чтобы глубокое листание не упиралось в OFFSET.
+    page.next_cursor = (
+        cursors.encode(page[-1], NEXT) if page.has_next() else '')
+    page.previous_cursor = (
+        cursors.encode(page[0], PREVIOUS) if page.has_previous() else '')
+    return page
@@ -0,0 +1,110 @@
+"""Адаптивные варианты картинки поста: несколько ширин, WebP и заглушка.
+
+Имена файлов строятся из хэша содержимого исходника, поэтому вариант
+никогда не меняется под тем же адресом и его можно отдавать с вечным
+кэшем браузера, а повторная загрузка той же картинки ничего не пересоздаёт.
+"""
+import base64
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps, features
+
+VARIANTS_DIR = 'variants'
+WIDTHS = (480, 960, 1440)
+DEFAULT_WIDTH = 960
+ASPECT_RATIO = 960 / 339
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_BLUR = 1
+QUALITY = {'JPEG': 82, 'WEBP': 78}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+def output_formats():
+    """WebP — первым, если Pillow собран с libwebp; JPEG есть всегда."""
+    if features.check('webp'):
+        return ['WEBP', 'JPEG']
+    return ['JPEG']
+
+
+def _content_hash(field):
+    field.open('rb')
+    try:
+        digest = hashlib.sha256()
+        for chunk in field.chunks():
+            digest.update(chunk)
+    finally:
+        field.close()
+    return digest.hexdigest()[:20]
+
+
+def _crop(image):
+    """Обрезка по центру до пропорций карточки поста."""
+    width, height = image.size
+    if width / height > ASPECT_RATIO:
+        size = (max(1, round(height * ASPECT_RATIO)), height)
+    else:
+        size = (width, max(1, round(width / ASPECT_RATIO)))
+    return ImageOps.fit(image, size, Image.LANCZOS)
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    image.save(
+        buffer, image_format, quality=QUALITY[image_format], optimize=True)
+    return buffer.getvalue()
+
+
+def _save(name, image, image_format):
+    if not default_storage.exists(name):
+        name = default_storage.save(
+            name, ContentFile(_encode(image, image_format)))
+    return default_storage.url(name)
+
+
+def _placeholder(image):
+    height = max(1, round(PLACEHOLDER_WIDTH / ASPECT_RATIO))
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(PLACEHOLDER_BLUR))
+    data = base64.b64encode(_encode(tiny, 'JPEG')).decode()
+    return f'data:image/jpeg;base64,{data}'
+
+
+def build_variants(field, placeholder=True):
+    """Создаёт варианты картинки и возвращает их описание.
+
+    {'src': адрес JPEG по умолчанию,
+     'sources': [{'type': MIME, 'srcset': [[адрес, ширина], ...]}, ...],
+     'placeholder': data: URI размытой заглушки или ''}
+    """
+    digest = _content_hash(field)
+    field.open('rb')
+    try:
+        with Image.open(field) as source:
+            image = _crop(ImageOps.exif_transpose(source).convert('RGB'))
+    finally:
+        field.close()
+    # Не растягиваем картинку шире исходника: это только лишние байты.
+    widths = [width for width in WIDTHS if width <= image.width]
+    widths = widths or [image.width]
+    sources = []
+    for image_format in output_formats():
+        srcset = []
+        for width in widths:
+            resized = image.resize(
+                (width, max(1, round(width / ASPECT_RATIO))), Image.LANCZOS)
+            name = (f'{VARIANTS_DIR}/{digest[:2]}/'
+                    f'{digest}-{width}.{EXTENSIONS[image_format]}')
+            srcset.append([_save(name, resized, image_format), width])
+        sources.append({'type': MIME_TYPES[image_format], 'srcset': srcset})
+    jpeg = sources[-1]['srcset']
+    src = next(
+        (url for url, width in jpeg if width >= DEFAULT_WIDTH), jpeg[-1][0])
+    return {
+        'src': src,
+        'sources': sources,
+        'placeholder': _placeholder(image) if placeholder else '',
+    }
@@ -1,14 +1,33 @@
+from urllib.parse import urlencode
+
+from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.conf import settings
+from django.views.decorators.cache import never_cache
+from core.db.routers import use_primary
+from . import export
+from .counters import user_counters
 from .models import Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from .utils import posts_paginator
+from .utils import feed_queryset, post_detail_queryset, posts_paginator
+from .feed import FEED_ORDERING, feed_posts
+from .search import search as search_posts
+from .thumbnails import schedule_thumbnail
+from .caching import (
+    cache_page_tagged, condition_tagged, group_tags, index_tags,
+    post_detail_tags, profile_tags
+)
+
+PAGE_CACHE_TIMEOUT = settings.CONSTANTS['PAGE_CACHE_TIMEOUT']
 
 
-@cache_page(20, key_prefix='index_page')
+@condition_tagged(index_tags)
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, index_tags)
 def index(request):
-    posts = Post.objects.all()
+    posts = feed_queryset(Post.objects.all())
     page_obj = posts_paginator(request, posts)
     context = {
         'page_obj': page_obj,
@@ -18,18 +37,32 @@ def index(request):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user).select_related('author', 'group')
-    page_obj = posts_paginator(request, posts)
+    posts = feed_queryset(feed_posts(request.user))
+    page_obj = posts_paginator(request, posts, FEED_ORDERING)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(
+        search_posts(query), settings.CONSTANTS['POSTS_PER_PAGE'])
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@condition_tagged(group_tags)
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, group_tags)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)
+    posts = feed_queryset(group.posts.all())
     page_obj = posts_paginator(request, posts)
     context = {
         'page_obj': page_obj,
@@ -38,21 +71,27 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@condition_tagged(profile_tags)
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, profile_tags)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    posts = feed_queryset(author.posts.all())
     page_obj = posts_paginator(request, posts)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
         'page_obj': page_obj,
         'author': author,
+        'counters': user_counters(author),
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author and not Follow.objects.filter(
@@ -62,19 +101,21 @@ def profile_follow(request, username):
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
 
 
+@condition_tagged(post_detail_tags)
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, post_detail_tags)
 def post_detail(request, post_id):
-    id = get_object_or_404(Post, id=post_id)
-    post = Post.objects.get(text=id.text)
-    posts_count = Post.objects.filter(author=id.author).count()
+    post = get_object_or_404(post_detail_queryset(), id=post_id)
     form = CommentForm()
     context = {
-        'posts_count': posts_count,
+        'posts_count': user_counters(post.author).posts_count,
         'post': post,
         'form': form,
     }
@@ -82,6 +123,8 @@ def post_detail(request, post_id):
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
@@ -89,11 +132,15 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if post.image:
+                schedule_thumbnail(post)
             return redirect('posts:profile', post.author.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
@@ -104,7 +151,12 @@ def post_edit(request, post_id):
         instance=post)
     if request.method == 'POST':
         if form.is_valid():
-            form.save()
+            post = form.save(commit=False)
+            if 'image' in form.changed_data:
+                post.thumbnail_url = post.image_variants = ''
+            post.save()
+            if 'image' in form.changed_data and post.image:
+                schedule_thumbnail(post)
             return redirect('posts:post_detail', post_id)
     context = {
         'post': post,
@@ -115,6 +167,8 @@ def post_edit(request, post_id):
 
 
 @login_required
+@use_primary
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -124,3 +178,27 @@ def add_comment(request, post_id):
         comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+@never_cache
+def export_data(request):
+    """Свои посты, комментарии, подписки и картинки zip-архивом.
+
+    Архив собирается по мере отдачи: ни таблицы, ни сам архив
+    в память не загружаются.
+    """
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest(f'Формат: {", ".join(export.FORMATS)}')
+    response = StreamingHttpResponse(
+        export.archive(
+            export.querysets(username=request.user.username),
+            fmt,
+            with_images=request.GET.get('images') == '1',
+        ),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.zip"')
+    return response
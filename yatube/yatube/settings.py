@@ -28,11 +28,15 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,14 +66,78 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
-
+# Потоков для Django под ASGI (yatube/asgi.py); столько же соединений
+# с базой может быть открыто одновременно.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
+
+
+# Профиль базы выбирается переменной окружения DB_PROFILE.
+DB_NAME = os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3'))
+# Сколько секунд держать соединение между запросами (0 — закрывать сразу).
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+DATABASE_PROFILES = {
+    # Как было: журнал по умолчанию, соединение на каждый запрос.
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DB_NAME,
+    },
+    # WAL: читатели не ждут писателя, писатели ждут друг друга до timeout.
+    'sqlite-wal': {
+        'ENGINE': 'core.db.sqlite',
+        'NAME': DB_NAME,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'OPTIONS': {
+            'timeout': int(os.getenv('DB_BUSY_TIMEOUT', 20)),
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                # Отрицательное значение — размер в КиБ.
+                'cache_size': -int(os.getenv('DB_CACHE_SIZE_KB', 20000)),
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
+    # Нужен psycopg2. За PgBouncer в режиме transaction ставьте
+    # DB_CONN_MAX_AGE=0 и DB_PGBOUNCER=1.
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'yatube'),
+        'USER': os.getenv('DB_USER', 'postgres'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(
+            os.getenv('DB_PGBOUNCER', 0))),
+    },
+}
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': DATABASE_PROFILES[os.getenv('DB_PROFILE', 'sqlite-wal')],
 }
+# Реплики для чтения: через запятую файлы SQLite или хосты PostgreSQL.
+# Локально файл-реплику обновляет python manage.py sync_replica.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    location_key = (
+        'HOST' if DATABASES['default']['ENGINE'].endswith('postgresql')
+        else 'NAME')
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        location_key: location,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+# Отставание реплик, которое терпим: столько секунд после записи
+# браузер читает с основной базы.
+DATABASE_REPLICA_LAG = int(os.getenv('DB_REPLICA_LAG', 15))
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+# Поиск: auto — FTS5 на SQLite, где он есть, иначе инвертированный индекс.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,6 +172,30 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 CONSTANTS = {
     'POSTS_PER_PAGE': int(os.environ.get('POSTS_PER_PAGE', 10)),
     'LETTERS_PER_POST': int(os.environ.get('LETTERS_PER_POST', 15)),
+    'PAGE_CACHE_TIMEOUT': int(os.environ.get('PAGE_CACHE_TIMEOUT', 3600)),
+    'THUMBNAIL_WORKERS': int(os.environ.get('THUMBNAIL_WORKERS', 2)),
+    # 1 — побочные действия (ленты, поиск, миниатюры, письма) выполняются
+    # в запросе; 0 — пишутся в очередь jobs для воркера run_jobs.
+    'JOBS_EAGER': int(os.environ.get('JOBS_EAGER', 1)),
+    'FEED_INBOX': int(os.environ.get('FEED_INBOX', 1)),
+    'FEED_CELEBRITY_FOLLOWERS': int(
+        os.environ.get('FEED_CELEBRITY_FOLLOWERS', 1000)),
+    'ADMIN_COUNT_ESTIMATE_FROM': int(
+        os.environ.get('ADMIN_COUNT_ESTIMATE_FROM', 10000)),
+}
+
+# Замеры запросов (core.instrumentation): доля запросов с замерами
+# (0 — выключено) и бюджеты SQL-запросов по именам вьюх, с учётом
+# запросов сессии и пользователя.
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 0))
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 10))
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 5,
+    'posts:follow_index': 6,
 }
 
 LOGIN_URL = 'users:login'
@@ -117,8 +209,30 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Бэкенд кэша выбирается переменной окружения CACHE_BACKEND.
+# locmem годится для одного процесса; file и sqlite общие для всех
+# воркеров на одной машине; memcached — для нескольких машин.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+    ),
+    'sqlite': (
+        'core.cache.sqlite.SQLiteCache',
+        os.path.join(BASE_DIR, 'cache.sqlite3'),
+    ),
+    'memcached': ('core.cache.memcached.MemcachedCache', '127.0.0.1:11211'),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[
+    os.getenv('CACHE_BACKEND', 'locmem')]
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_LOCATION),
+        # Одинаковые префикс и версия у всех воркеров — одинаковые ключи.
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+        'VERSION': int(os.getenv('CACHE_VERSION', 1)),
     }
 }
@@ -1,7 +1,13 @@
+import os
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.decorators.cache import cache_control
+from django.views.static import serve
+
+from posts.variants import VARIANTS_DIR
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
@@ -12,10 +18,18 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
     path('auth/', include('django.contrib.auth.urls')),
 ]
 
 if settings.DEBUG:
+    # Имена вариантов картинок уникальны по содержимому: кэшируем навсегда.
+    urlpatterns.append(re_path(
+        rf'^{settings.MEDIA_URL.lstrip("/")}{VARIANTS_DIR}/(?P<path>.*)$',
+        cache_control(max_age=365 * 24 * 60 * 60, public=True,
+                      immutable=True)(serve),
+        {'document_root': os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR)},
+    ))
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )